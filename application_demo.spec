@@ -2,6 +2,10 @@
 
 block_cipher = None
 
+# Compile the demo content set into its bundle, shipped alongside the text and YAML it falls back to
+import content_bundle
+content_bundle.build_set(True, SPECPATH)
+
 
 a = Analysis(['cst_frame.py'],
              binaries=[],
@@ -9,11 +13,12 @@ a = Analysis(['cst_frame.py'],
              ('convert_key_demo.yaml', '.'),
              ('img\\r_arr.png', '.\\img'),
              ('img\\cover_demo.jpg', '.\\img'),
-             ('config_demo.yaml', '.')],
+             ('config_demo.yaml', '.'),
+             ('content_demo.bundle', '.')],
              hiddenimports=[],
              hookspath=[],
              runtime_hooks=[],
-             excludes=[],
+             excludes=['numpy'],
              win_no_prefer_redirects=False,
              win_private_assemblies=False,
              cipher=block_cipher,
@@ -33,3 +38,31 @@ exe = EXE(pyz,
           upx=True,
           runtime_tmpdir=None,
           console=True )
+
+# Thin launcher - hands off to a running resident process, or starts the quiz cold
+launch_a = Analysis(['launch.py'],
+             binaries=[],
+             datas=[],
+             hiddenimports=[],
+             hookspath=[],
+             runtime_hooks=[],
+             excludes=['wx', 'numpy', 'yaml'],
+             win_no_prefer_redirects=False,
+             win_private_assemblies=False,
+             cipher=block_cipher,
+             noarchive=False)
+launch_pyz = PYZ(launch_a.pure, launch_a.zipped_data,
+             cipher=block_cipher)
+launch_exe = EXE(launch_pyz,
+          launch_a.scripts,
+          launch_a.binaries,
+          launch_a.zipfiles,
+          launch_a.datas,
+          [],
+          name='launch',
+          debug=False,
+          bootloader_ignore_signals=False,
+          strip=False,
+          upx=True,
+          runtime_tmpdir=None,
+          console=False )
@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""This module is the command-line batch scorer - it scores exported answer sheets without the GUI
+
+Answer sheets are read from JSONL, one {"subject": ..., "answers": ...} object per line, where answers is either a list
+of selections in questions file order or an object mapping question index to selection. CSV input has a header row of
+'subject' followed by question indices, and one sheet per row. Unanswered questions count as a selection of 0.
+
+Sheets are scored in chunks across a process pool, and results are written as a JSONL stream in input order. A
+malformed sheet is written as {"subject": ..., "line": ..., "error": ...} instead, and the run goes on to the rest.
+"""
+
+import argparse
+import collections
+import csv
+import json
+import multiprocessing
+import os
+import sys
+
+import numpy as np
+
+import config
+import content_bundle
+import convert_key
+import question_bank
+import scoring_batch
+from gbl_env import app_root
+
+# Content loaded once per process by init_worker
+_key = None
+_types = None
+
+
+def init_worker(questions_path, convert_key_path):
+    """Load the question types, convert key and config into a worker process
+
+            Without explicit paths the content bundle is used if there is one, its pages shared between workers.
+    """
+    global _key, _types
+
+    config.load_config()
+
+    bundle = content_bundle.current() if questions_path is None and convert_key_path is None else None
+    if bundle:
+        _types = np.asarray(bundle.question_bank().types, dtype=np.intp)
+        _key = bundle.convert_key()
+        return
+
+    questions_file, convert_key_file, _ = content_bundle.source_files()
+    _types = np.asarray(question_bank.QuestionBank.load(questions_path or os.path.join(app_root, questions_file)).types,
+                        dtype=np.intp)
+    _key = convert_key.open_key(convert_key_path or os.path.join(app_root, convert_key_file))
+
+
+def parse_jsonl(line):
+    """Parse a JSONL answer sheet into (subject, answers), raising ValueError if it is malformed"""
+    sheet = json.loads(line)
+    if not isinstance(sheet, dict) or 'subject' not in sheet or 'answers' not in sheet:
+        raise ValueError("Answer sheets must be objects with a 'subject' and 'answers'")
+
+    return sheet['subject'], sheet['answers']
+
+
+def parse_csv(columns, row):
+    """Parse a CSV answer sheet into (subject, answers), raising ValueError if it is malformed"""
+    if len(row) > len(columns) + 1:
+        raise ValueError("Row has {} cells for {} questions".format(len(row) - 1, len(columns)))
+
+    answers = {}
+    for q, value in zip(columns, row[1:]):
+        if value.strip():
+            try:
+                answers[q] = int(value)
+            except ValueError:
+                raise ValueError("Selection {!r} for question {} is not a whole number".format(value, q))
+
+    return row[0], answers
+
+
+def sheet_selections(answers, count, maximum):
+    """Return a sheet's answers as a list of one selection per question, raising ValueError if any is malformed"""
+    if isinstance(answers, dict):
+        items = answers.items()
+    elif isinstance(answers, list):
+        if len(answers) > count:
+            raise ValueError("{} answers given for {} questions".format(len(answers), count))
+        items = enumerate(answers)
+    else:
+        raise ValueError("Answers must be a list or an object")
+
+    selections = [0] * count
+    for q, value in items:
+        try:
+            index = int(q)
+        except ValueError:
+            raise ValueError("Question index {!r} is not a whole number".format(q))
+        if not 0 <= index < count:
+            raise ValueError("Question {} is out of range, there are {} questions".format(index, count))
+        if not isinstance(value, int) or isinstance(value, bool) or not 0 <= value <= maximum:
+            raise ValueError("Selection {!r} for question {} is not from 0 to {}".format(value, index, maximum))
+        selections[index] = value
+
+    return selections
+
+
+def score_chunk(chunk):
+    """Score a chunk of answer sheets, returning their results as JSONL text and the number that could not be scored
+
+            A malformed sheet is not scored. In its place an error record gives its subject, if known, its line in
+            the input and the problem found.
+
+            Args:
+                chunk (tuple): ('jsonl', (line number, raw line) pairs) or ('csv', (question indices, (line number,
+                    row) pairs))
+    """
+    kind, records = chunk
+    if kind == 'csv':
+        columns, records = records
+    maximum = len(config.settings.rbox_labels)
+
+    # Each output record in input order, the scored sheets' filled in once the chunk has been scored as one batch
+    lines = []
+    scored = []
+    selections = []
+    for number, record in records:
+        subject = record[0] if kind == 'csv' else None
+        try:
+            subject, answers = parse_jsonl(record) if kind == 'jsonl' else parse_csv(columns, record)
+            selections.append(sheet_selections(answers, len(_types), maximum))
+        except ValueError as error:
+            lines.append(json.dumps({'subject': subject, 'line': number, 'error': str(error)}) + "\n")
+        else:
+            scored.append((len(lines), subject))
+            lines.append(None)
+
+    if scored:
+        scores, rankings, results = scoring_batch.score_answers_batch(
+            _types, np.array(selections, dtype=np.int64), _key, config.settings.initials)
+        for (i, subject), score, ranking, result in zip(scored, scores.tolist(), rankings, results):
+            lines[i] = json.dumps({'subject': subject, 'scoring': score, 'ranking': ranking,
+                                   'results': result.tolist()}) + "\n"
+
+    return "".join(lines), len(records) - len(scored)
+
+
+def read_chunks(stream, kind, size):
+    """Yield the answer sheets of an input stream, with their line numbers, as chunks of up to size sheets"""
+    if kind == 'jsonl':
+        lines = []
+        for number, line in enumerate(stream, 1):
+            if line.strip():
+                lines.append((number, line))
+            if len(lines) == size:
+                yield kind, lines
+                lines = []
+        if lines:
+            yield kind, lines
+    else:
+        reader = csv.reader(stream)
+        header = next(reader, None)
+        if not header or header[0].strip().lower() != 'subject':
+            raise ValueError("CSV input must start with a 'subject' column")
+        try:
+            columns = [int(q) for q in header[1:]]
+        except ValueError:
+            raise ValueError("CSV header must name questions by their index")
+
+        rows = []
+        for row in reader:
+            if row:
+                rows.append((reader.line_num, row))
+            if len(rows) == size:
+                yield kind, (columns, rows)
+                rows = []
+        if rows:
+            yield kind, (columns, rows)
+
+
+def score_stream(source, output, kind, questions_path, convert_key_path, processes, size):
+    """Score every answer sheet of source, writing results to output in input order
+
+            Returns:
+                int: Number of answer sheets that were malformed and written as error records
+    """
+    chunks = read_chunks(source, kind, size)
+    errors = 0
+
+    # A single process scores in place, which is also handy for debugging
+    if processes == 1:
+        init_worker(questions_path, convert_key_path)
+        for chunk in chunks:
+            text, failed = score_chunk(chunk)
+            output.write(text)
+            errors += failed
+        return errors
+
+    # Keep a bounded number of chunks in flight so a huge input is never read into memory all at once
+    with multiprocessing.Pool(processes, initializer=init_worker, initargs=(questions_path, convert_key_path)) as pool:
+        pending = collections.deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(score_chunk, (chunk,)))
+            if len(pending) >= processes * 2:
+                text, failed = pending.popleft().get()
+                output.write(text)
+                errors += failed
+        while pending:
+            text, failed = pending.popleft().get()
+            output.write(text)
+            errors += failed
+
+    return errors
+
+
+def main(argv=None):
+    """Parse the command line and score the answer sheets it names"""
+    parser = argparse.ArgumentParser(description="Score exported answer sheets, writing results as JSONL")
+    parser.add_argument('input', help="JSONL or CSV file of answer sheets, or - for standard input")
+    parser.add_argument('-o', '--output', help="File to write results to, standard output if omitted")
+    parser.add_argument('--format', choices=('jsonl', 'csv'),
+                        help="Input format, guessed from its extension if omitted")
+    parser.add_argument('--questions', help="Questions file the answers refer to, in its original order. Defaults to "
+                                              "the content bundle, or else the active questions file")
+    parser.add_argument('--convert-key', help="Convert key YAML, or the YAML path of an imported SQLite convert key. "
+                                              "Defaults to the content bundle, or else the active convert key")
+    parser.add_argument('-j', '--processes', type=int, default=os.cpu_count(), help="Number of worker processes")
+    parser.add_argument('--chunk', type=int, default=1000, help="Number of answer sheets scored per task")
+    args = parser.parse_args(argv)
+
+    kind = args.format or ('csv' if args.input.lower().endswith('.csv') else 'jsonl')
+    source = sys.stdin if args.input == '-' else open(args.input, 'r', newline='')
+    output = open(args.output, 'w') if args.output else sys.stdout
+
+    try:
+        errors = score_stream(source, output, kind, args.questions, args.convert_key, args.processes, args.chunk)
+    except ValueError as error:
+        # An input that cannot be read at all, such as a CSV without its header
+        print("Could not score {}: {}".format(args.input, error), file=sys.stderr)
+        return 2
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+
+    # Every other sheet has been scored, but exit with an error so a scheduled run flags the bad ones
+    if errors:
+        print("{} answer sheets could not be scored, see the error records in the output".format(errors),
+              file=sys.stderr)
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
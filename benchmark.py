@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+"""This module is the benchmark suite - it times the loaders, ranking and result rendering against generated content
+
+Content is generated at multiples of the demo content set in a temporary directory, so the suite runs from a clean
+checkout. The results panel is only benchmarked when wx can be imported; on a machine without a display, run under
+a virtual one, e.g.
+
+    xvfb-run -a python benchmark.py -o bench.json
+    python benchmark.py --compare bench.json
+
+Results are written as JSON, one entry per case with its best, median and mean time in milliseconds, so runs can be
+compared over time with --compare.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import yaml
+
+import config
+import content_bundle
+import convert_key
+import question_bank
+import scoring
+from gbl_env import app_root
+
+# Multiples of the demo content set to generate, and the result counts to render
+scales = (1, 10, 100)
+result_counts = (100, 1000, 10000)
+
+
+def generate_content(directory, scale):
+    """Write a content set of scale times the demo's questions and convert key rows, returning its three paths"""
+    questions_file, convert_key_file, config_file = content_bundle.source_files(True)
+
+    with open(os.path.join(app_root, questions_file), 'r') as stream:
+        questions = [question_bank.parse_line(line) for line in stream if line.strip()]
+    questions_path = os.path.join(directory, 'questions_x{}.txt'.format(scale))
+    with open(questions_path, 'w') as stream:
+        for copy in range(scale):
+            for question, q_type in questions:
+                stream.write("{} :: {} ({})\n".format(q_type, question, copy))
+
+    # Fill every slot of the table, each with scale times the demo's rows per slot, so any ranking finds results
+    with open(os.path.join(app_root, convert_key_file), 'r') as stream:
+        rows = [row for entries in yaml.safe_load(stream).values() for row in entries]
+    per_slot = max(1, len(rows) * scale // convert_key.n_slots)
+    mapping = {}
+    for slot in range(convert_key.n_slots):
+        first, rest = divmod(slot, scoring.n_categories ** 2)
+        second, third = divmod(rest, scoring.n_categories)
+        mapping[(first << 6) | (second << 3) | third] = [
+            [str(value) for value in rows[(slot * per_slot + i) % len(rows)]] for i in range(per_slot)]
+    convert_key_path = os.path.join(directory, 'convert_key_x{}.yaml'.format(scale))
+    with open(convert_key_path, 'w') as stream:
+        yaml.safe_dump(mapping, stream)
+
+    config_path = os.path.join(directory, 'config_x{}.yaml'.format(scale))
+    shutil.copyfile(os.path.join(app_root, config_file), config_path)
+
+    return questions_path, convert_key_path, config_path
+
+
+def measure(function, repeat, setup=None):
+    """Call a function repeat times, each after an untimed setup if given, returning the timings in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return timings
+
+
+def summarise(timings, **info):
+    """Return the JSON entry of a case's timings"""
+    return dict(info, best_ms=min(timings), median_ms=statistics.median(timings),
+                mean_ms=statistics.mean(timings), runs=len(timings))
+
+
+def bench_loaders(directory, repeat, scales=scales):
+    """Time the question, convert key and bundle loaders at each scale, returning the cases and the key of each scale"""
+    cases = {}
+    keys = {}
+
+    for scale in scales:
+        questions_path, convert_key_path, config_path = generate_content(directory, scale)
+        bundle_path = content_bundle.build(questions_path, convert_key_path, config_path,
+                                           os.path.join(directory, 'content_x{}.bundle'.format(scale)))
+        size = len(question_bank.QuestionBank.load(questions_path).types)
+
+        cases['load_questions/text/x{}'.format(scale)] = summarise(
+            measure(lambda: question_bank.QuestionBank.load(questions_path), repeat), questions=size)
+        cases['load_convert_key/yaml/x{}'.format(scale)] = summarise(
+            measure(lambda: convert_key.ConvertKey.from_yaml(convert_key_path), max(1, repeat // 5)))
+
+        # Time the compiled cache once it has been written by a first load, keeping that key for the result cases
+        keys[scale], _ = convert_key.load_cached(convert_key_path)
+        cases['load_convert_key/cache/x{}'.format(scale)] = summarise(
+            measure(lambda: convert_key.load_cached(convert_key_path), repeat))
+
+        cases['load_content/bundle/x{}'.format(scale)] = summarise(
+            measure(lambda: open_bundle(bundle_path), repeat))
+
+    return cases, keys
+
+
+def open_bundle(path):
+    """Open a bundle and everything in it, as the application does"""
+    bundle = content_bundle.Bundle(path)
+
+    return bundle.question_bank(), bundle.convert_key(), config.parse_config(bundle.config())
+
+
+def bench_config(repeat):
+    """Time loading the active config"""
+    return {'load_config': summarise(measure(config.load_config, repeat))}
+
+
+def tie_patterns(rng):
+    """Return named score lists with distinct, partly tied and fully tied scores"""
+    return {'distinct': [70, 60, 50, 40, 30, 20, 10],
+            'all_tied': [40] * scoring.n_categories,
+            'top_tied': [50, 50, 50, 30, 20, 10, 0],
+            'pairs_tied': [60, 60, 40, 40, 20, 20, 0],
+            'random': [rng.randint(0, 12) for _ in range(scoring.n_categories)]}
+
+
+def bench_ranking(repeat, rng):
+    """Time list_max_index on every tie pattern, over many calls per run"""
+    cases = {}
+    calls = 10000
+
+    for name, scores in tie_patterns(rng).items():
+        def rank():
+            for _ in range(calls):
+                scoring.list_max_index(scores, scoring.n_ranks)
+        cases['list_max_index/{}'.format(name)] = summarise(measure(rank, repeat), calls=calls)
+
+    return cases
+
+
+def bench_results(keys, repeat):
+    """Time the worst case of determine_results, every category tied, against each scale of convert key"""
+    cases = {}
+    ranking = scoring.list_max_index([40] * scoring.n_categories, scoring.n_ranks)
+    initials = config.settings.initials
+
+    for scale, key in keys.items():
+        count = len(scoring.determine_results(ranking, key, initials))
+        cases['determine_results/all_tied/x{}'.format(scale)] = summarise(
+            measure(lambda: scoring.determine_results(ranking, key, initials), repeat), results=count)
+
+    return cases
+
+
+def bench_refresh(keys, repeat):
+    """Time ScrolledResultsPanel.refresh with each result count, or return no cases if wx is unavailable"""
+    try:
+        import wx
+        import cst_panel
+    except ImportError as error:
+        print("Skipping the results panel: {}".format(error), file=sys.stderr)
+        return {}
+
+    app = wx.App()
+    frame = wx.Frame(None, size=(800, 600))
+    holder = wx.Panel(frame)
+    holder.parent = frame
+    panel = cst_panel.ScrolledResultsPanel(holder)
+    frame.Show()
+
+    # Draw the results from the largest key, with every category tied
+    ranking = scoring.list_max_index([40] * scoring.n_categories, scoring.n_ranks)
+    results = scoring.determine_results(ranking, keys[max(keys)], config.settings.initials)
+
+    def setup(count):
+        def clear():
+            panel.clear()
+            frame.results = scoring.ResultSet()
+            frame.results.extend(results[:count])
+        return clear
+
+    cases = {}
+    for count in result_counts:
+        if count > len(results):
+            continue
+
+        def refresh():
+            panel.refresh()
+            panel.Update()
+        cases['refresh/{}'.format(count)] = summarise(measure(refresh, repeat, setup(count)), results=count)
+
+    frame.Destroy()
+    app.Destroy()
+
+    return cases
+
+
+def environment():
+    """Return a description of the machine and revision the benchmarks ran on"""
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=app_root, capture_output=True,
+                                  text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+
+    return {'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'), 'revision': revision, 'python': platform.python_version(),
+            'platform': platform.platform(), 'machine': platform.machine()}
+
+
+def compare(previous, current):
+    """Print each case's median time against a previous run"""
+    for name, case in current['cases'].items():
+        before = previous['cases'].get(name)
+        if before:
+            ratio = case['median_ms'] / before['median_ms'] if before['median_ms'] else float('inf')
+            print("{:<40} {:>10.3f} ms {:>10.3f} ms {:>7.2f}x".format(name, before['median_ms'], case['median_ms'],
+                                                                     ratio))
+        else:
+            print("{:<40} {:>13} {:>10.3f} ms".format(name, 'new', case['median_ms']))
+
+
+def main(argv=None):
+    """Parse the command line, run the benchmarks and write their results"""
+    parser = argparse.ArgumentParser(description="Benchmark the loaders, ranking and result rendering")
+    parser.add_argument('-o', '--output', help="File to write the JSON results to, standard output if omitted")
+    parser.add_argument('--compare', help="JSON results of a previous run to compare this run against")
+    parser.add_argument('--repeat', type=int, default=10, help="Number of timed runs of each case")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the random tie pattern")
+    parser.add_argument('--scales', type=int, nargs='+', default=scales,
+                        help="Multiples of the demo content set to generate. Parsing YAML at x100 takes a while")
+    args = parser.parse_args(argv)
+
+    config.load_config()
+    directory = tempfile.mkdtemp(prefix='psynt-bench-')
+    try:
+        cases, keys = bench_loaders(directory, args.repeat, args.scales)
+        cases.update(bench_config(args.repeat))
+        cases.update(bench_ranking(args.repeat, random.Random(args.seed)))
+        cases.update(bench_results(keys, args.repeat))
+        cases.update(bench_refresh(keys, args.repeat))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    report = {'environment': environment(), 'cases': cases}
+    if args.output:
+        with open(args.output, 'w') as stream:
+            json.dump(report, stream, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare, 'r') as stream:
+            compare(json.load(stream), report)
+
+
+if __name__ == '__main__':
+    main()
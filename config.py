@@ -1,46 +1,159 @@
 # -*- coding: utf-8 -*-
-"""This module loads common parameters from the config.yaml for reference"""
+"""This module loads common parameters from the config.yaml into a checked, read-only settings object"""
 
 import os
+from typing import Callable, NamedTuple, Optional, Tuple
+
 import yaml
 
-from cst_frame import app_root, is_demo
-
-# Defining & Initializing config variables
-staticbox_label = None
-rbox_labels = None
-summary_col_1 = None
-summary_col_2 = None
-summary_col_3 = None
-summary_col_4 = None
-link_1 = None
-link_2 = None
-link_3 = None
-link_4 = None
-link_vis_1 = None
-link_vis_2 = None
-link_vis_3 = None
-link_vis_4 = None
-link_var_1 = None
-link_var_2 = None
-link_var_3 = None
-link_var_4 = None
-summary_text = None
-initials = None
-instructions = None
+import content_bundle
+import perf_trace
+import scoring
+from gbl_env import app_root, is_demo
+
+# Result field shown in each of the four summary columns
+summary_fields = (0, 2, 1, 3)
+
+# Settings loaded by load_config
+settings = None
+
+
+class Column(NamedTuple):
+    """Summary column, with its link precompiled
+
+            Attributes:
+                header (str): Column heading
+                field (int): Index of the result field shown in the column
+                link (callable): Returns the link of a result row, or is None if the column shows no links
+                link_field (int): Index of the result field the link is formatted from, or None if there is no link
+    """
+
+    header: str
+    field: int
+    link: Optional[Callable]
+    link_field: Optional[int] = None
+
+
+class Settings(NamedTuple):
+    """Parameters loaded from the config file
+
+            Attributes:
+                staticbox_label (str): Prompt shown above each page of questions
+                rbox_labels (tuple: str): Label of each selection, lowest first
+                summary_text (str): Text shown above the results
+                initials (tuple: str): Short name of each category, used to label the affinity of a result
+                instructions (str): Instructions shown before the quiz
+                columns (tuple: Column): The four summary columns, in display order
+    """
+
+    staticbox_label: str
+    rbox_labels: Tuple[str, ...]
+    summary_text: str
+    initials: Tuple[str, ...]
+    instructions: str
+    columns: Tuple[Column, ...]
+
+
+def compile_link(link, link_var):
+    """Return a callable formatting a result row's link field into a link"""
+    fmt = link.format
+
+    def format_link(result):
+        return fmt(result[link_var])
+
+    return format_link
+
 
+def require(values, key, kind):
+    """Return a config value, raising ValueError if it is missing or of the wrong type"""
+    if key not in values:
+        raise ValueError("Config is missing '{}'".format(key))
+    if not isinstance(values[key], kind) or (kind is int and isinstance(values[key], bool)):
+        raise ValueError("Config '{}' must be {}, found {!r}".format(key, kind.__name__, values[key]))
 
+    return values[key]
+
+
+def parse_config(values):
+    """Check the raw values of a config file and compile them into Settings, raising ValueError on any problem"""
+    if not isinstance(values, dict):
+        raise ValueError("Config must be a mapping of parameters")
+
+    keys = {'staticbox_label', 'rbox_labels', 'summary_text', 'initials', 'instructions'}
+    for i in range(1, len(summary_fields) + 1):
+        keys |= {'summary_col_{}'.format(i), 'link_{}'.format(i), 'link_vis_{}'.format(i), 'link_var_{}'.format(i)}
+    unknown = sorted(set(values) - keys, key=str)
+    if unknown:
+        raise ValueError("Config has unknown parameters: {}".format(", ".join(map(str, unknown))))
+
+    rbox_labels = tuple(require(values, 'rbox_labels', list))
+    if not rbox_labels or not all(isinstance(label, str) for label in rbox_labels):
+        raise ValueError("Config 'rbox_labels' must be a list of one or more labels")
+
+    # A NULL initial is allowed, and shows as 'None'
+    initials = tuple(require(values, 'initials', list))
+    if len(initials) != scoring.n_categories or not all(isinstance(i, (str, type(None))) for i in initials):
+        raise ValueError("Config 'initials' must list {} initials, one per category".format(scoring.n_categories))
+
+    columns = []
+    for i, field in enumerate(summary_fields, 1):
+        header = require(values, 'summary_col_{}'.format(i), str)
+        link = require(values, 'link_{}'.format(i), str)
+        link_vis = require(values, 'link_vis_{}'.format(i), bool)
+        link_var = require(values, 'link_var_{}'.format(i), int)
+        if link_var < 0:
+            raise ValueError("Config 'link_var_{}' must not be negative".format(i))
+        try:
+            link.format('')
+        except (IndexError, KeyError, ValueError) as error:
+            raise ValueError("Config 'link_{}' is not a valid link format: {}".format(i, error))
+
+        if link_vis:
+            columns.append(Column(header, field, compile_link(link, link_var), link_var))
+        else:
+            columns.append(Column(header, field, None))
+
+    return Settings(staticbox_label=require(values, 'staticbox_label', str),
+                    rbox_labels=rbox_labels,
+                    summary_text=require(values, 'summary_text', str),
+                    initials=initials,
+                    instructions=require(values, 'instructions', str),
+                    columns=tuple(columns))
+
+
+def check_fields(settings, width):
+    """Check that every result field the summary shows or links from exists, raising ValueError if not
+
+            Args:
+                settings (Settings): Parameters to check
+                width (int): Number of result fields held by the convert key, to which the affinity label is added
+    """
+    for i, column in enumerate(settings.columns, 1):
+        if column.field > width:
+            raise ValueError("Config 'summary_col_{}' shows result field {}, but results only have fields 0 to {}"
+                             .format(i, column.field, width))
+        if column.link_field is not None and column.link_field > width:
+            raise ValueError("Config 'link_var_{}' is {}, but results only have fields 0 to {}".format(
+                i, column.link_field, width))
+
+
+@perf_trace.span('config.load_config', 'loader')
 def load_config():
-    """Load the parameters"""
-    if is_demo:
-        _file = 'config_demo.yaml'
+    """Load the parameters, from the content bundle if there is one, into settings. Returns the settings"""
+    global settings
+
+    bundle = content_bundle.current()
+    if bundle:
+        values = bundle.config()
     else:
-        _file = 'config_production.yaml'
+        if is_demo:
+            _file = 'config_demo.yaml'
+        else:
+            _file = 'config_production.yaml'
+
+        with open(os.path.join(app_root, _file), 'r') as stream:
+            values = yaml.safe_load(stream)
 
-    with open(os.path.join(app_root, _file), 'r') as stream:
-        _temp = yaml.safe_load(stream)
+    settings = parse_config(values)
 
-        # Load in variables that match those defined above and are not modules or the like
-        for k in globals():
-            if k[:2] != "__" and k not in ['yaml', 'os', 'app_root', 'is_demo', 'load_config']:
-                globals()[k] = _temp[k]
+    return settings
@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+"""This module compiles a content set - questions, convert key and config - into one memory-mapped binary bundle
+
+The text and YAML files remain the authoring format. Build a bundle from them with
+
+    python content_bundle.py [--production]
+
+and the application loads the bundle instead, with no parsing: question texts, convert key columns and tables are
+read straight out of the mapped file as they are needed. A bundle that is missing, built by another version or from
+source files that have since changed is ignored, and the text and YAML loaders are used as before. The checksum of the
+whole payload is only checked by --verify, since hashing it would read every page of the bundle at each launch.
+
+Layout: an 8-byte magic, the bundle version and header length as two unsigned 32-bit integers, a UTF-8 JSON header
+padded to 8 bytes, then the payload. The header holds the offset and length of each section within the payload, each
+aligned to 8 bytes, the SHA-256 of the payload, and the SHA-256, modification time and size of each source file.
+"""
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+
+import yaml
+
+import convert_key
+import perf_trace
+import question_bank
+from gbl_env import app_root, is_demo, source_matches
+
+magic = b'PSYNTBND'
+bundle_version = 1
+
+# Magic, then bundle version and header length
+_preamble = struct.Struct('<8sII')
+
+# Kind of each convert key cell, as stored alongside its text
+kind_none, kind_str, kind_int, kind_float = 0, 1, 2, 3
+
+# The open bundle of the active content set, or False once found to be unusable
+_current = None
+_lock = threading.Lock()
+
+
+def source_files(demo=is_demo):
+    """Return the (questions, convert key, config) file names of a content set"""
+    if demo:
+        return 'questions_demo.txt', 'convert_key_demo.yaml', 'config_demo.yaml'
+
+    return 'questions_production.txt', 'convert_key_production.yaml', 'config_production.yaml'
+
+
+def bundle_file(demo=is_demo):
+    """Return the bundle file name of a content set"""
+    return 'content_demo.bundle' if demo else 'content_production.bundle'
+
+
+class PackedColumn:
+    """Read-only sequence of convert key cells held as UTF-8 text in a bundle, decoded on access
+
+            Args:
+                blob (memoryview): Every cell's text, concatenated
+                offsets (memoryview: int): Start of each cell's text within the blob, followed by the end of the last
+                kinds (memoryview: int): Kind of each cell, one of kind_none, kind_str, kind_int or kind_float
+    """
+
+    def __init__(self, blob, offsets, kinds):
+        """Constructor"""
+        self._blob = blob
+        self._offsets = offsets
+        self._kinds = kinds
+
+    def __len__(self):
+        return len(self._kinds)
+
+    def __getitem__(self, index):
+        kind = self._kinds[index]
+        if kind == kind_none:
+            return None
+
+        text = str(self._blob[self._offsets[index]:self._offsets[index + 1]], 'utf-8')
+        if kind == kind_int:
+            return int(text)
+        if kind == kind_float:
+            return float(text)
+
+        return text
+
+
+class Bundle:
+    """Content set held in a memory-mapped bundle file
+
+            Args:
+                path (str): Path to a bundle written by build
+                verify (bool): Check the checksum of the bundle's whole payload before use
+
+            Attributes:
+                path (str): Path to the bundle
+                header (dict): Decoded bundle header, including each source file's SHA-256, modification time and size
+    """
+
+    def __init__(self, path, verify=False):
+        """Constructor"""
+        self.path = path
+
+        with open(path, 'rb') as stream:
+            self._map = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+
+        if len(self._view) < _preamble.size:
+            raise ValueError("{} is not a content bundle".format(path))
+        file_magic, version, header_length = _preamble.unpack_from(self._view)
+        if file_magic != magic or version != bundle_version:
+            raise ValueError("{} is not a version {} content bundle".format(path, bundle_version))
+
+        self._payload = _preamble.size + header_length
+        self.header = json.loads(str(self._view[_preamble.size:self._payload], 'utf-8'))
+        if self.header['byteorder'] != sys.byteorder:
+            raise ValueError("{} was built for a {}-endian machine".format(path, self.header['byteorder']))
+
+        if verify and hashlib.sha256(self._view[self._payload:]).hexdigest() != self.header['sha256']:
+            raise ValueError("{} is damaged, its checksum does not match".format(path))
+
+    def section(self, name, typecode='B'):
+        """Return a section of the bundle as a memoryview, cast to an array typecode"""
+        offset, length = self.header['sections'][name]
+        offset += self._payload
+
+        return self._view[offset:offset + length].cast(typecode)
+
+    def question_bank(self):
+        """Return a question bank reading its questions straight from the bundle"""
+        return question_bank.QuestionBank(self.section('questions.blob'), self.section('questions.offsets', 'I'),
+                                          self.section('questions.types'))
+
+    def convert_key(self):
+        """Return a convert key reading its table and results straight from the bundle"""
+        columns = [PackedColumn(self.section('key.{}.blob'.format(i)), self.section('key.{}.offsets'.format(i), 'I'),
+                                self.section('key.{}.kinds'.format(i)))
+                   for i in range(self.header['width'])]
+
+        return convert_key.ConvertKey.from_tables(self.section('key.first', 'i'), self.section('key.count', 'I'),
+                                                  columns)
+
+    def config(self):
+        """Return the config values held in the bundle"""
+        return json.loads(str(self.section('config'), 'utf-8'))
+
+    def is_stale(self, directory):
+        """Whether the content of any source file found in a directory differs from that the bundle was built from"""
+        stats = self.header.get('stats', {})
+        for name, digest in self.header['sources'].items():
+            source = os.path.join(directory, name)
+            if os.path.exists(source) and not source_matches(source, digest, *stats.get(name, (None, None))):
+                return True
+
+        return False
+
+
+@perf_trace.span('content_bundle.current', 'loader')
+def current():
+    """Return the bundle of the active content set, opened once per process, or None if it cannot be used"""
+    global _current
+
+    with _lock:
+        if _current is None:
+            _current = False
+            path = os.path.join(app_root, bundle_file())
+            if os.path.exists(path):
+                try:
+                    bundle = Bundle(path)
+                    # A frozen build ships its bundle and sources together, so they cannot have drifted apart
+                    if not getattr(sys, 'frozen', False) and bundle.is_stale(app_root):
+                        print("Ignoring {}, its sources have changed since it was built".format(path),
+                              file=sys.stderr)
+                    else:
+                        _current = bundle
+                except (OSError, ValueError, KeyError) as error:
+                    print("Ignoring {}: {}".format(path, error), file=sys.stderr)
+
+        return _current or None
+
+
+def pack_column(values):
+    """Pack a column of convert key cells into (blob, offsets, kinds)"""
+    encoded = []
+    kinds = array('B')
+    for value in values:
+        if value is None:
+            encoded.append(b'')
+            kinds.append(kind_none)
+        elif isinstance(value, str):
+            encoded.append(value.encode('utf-8'))
+            kinds.append(kind_str)
+        elif isinstance(value, int) and not isinstance(value, bool):
+            encoded.append(str(value).encode('utf-8'))
+            kinds.append(kind_int)
+        elif isinstance(value, float):
+            encoded.append(repr(value).encode('utf-8'))
+            kinds.append(kind_float)
+        else:
+            raise ValueError("Convert key cells must be text or numbers, found {!r}".format(value))
+
+    offsets = array('I', [0])
+    for text in encoded:
+        offsets.append(offsets[-1] + len(text))
+
+    return b"".join(encoded), offsets, kinds
+
+
+def build(questions_path, convert_key_path, config_path, destination):
+    """Compile a content set's text and YAML files into a bundle, replacing any existing one atomically"""
+    bank = question_bank.QuestionBank.load(questions_path)
+    key = convert_key.ConvertKey.from_yaml(convert_key_path)
+    with open(config_path, 'r') as stream:
+        values = yaml.safe_load(stream)
+
+    sections = [('questions.blob', bank.blob),
+                ('questions.offsets', bank.offsets),
+                ('questions.types', bank.types),
+                ('key.first', key.first),
+                ('key.count', key.count)]
+    for i, column in enumerate(key.columns):
+        blob, offsets, kinds = pack_column(column)
+        sections += [('key.{}.blob'.format(i), blob), ('key.{}.offsets'.format(i), offsets),
+                     ('key.{}.kinds'.format(i), kinds)]
+    sections.append(('config', json.dumps(values).encode('utf-8')))
+
+    # Lay the sections out one after another, each aligned for casting
+    payload = bytearray()
+    layout = {}
+    for name, data in sections:
+        payload += b'\0' * (-len(payload) % 8)
+        data = bytes(data)
+        layout[name] = len(payload), len(data)
+        payload += data
+
+    sources = {}
+    stats = {}
+    for path in (questions_path, convert_key_path, config_path):
+        stat = os.stat(path)
+        with open(path, 'rb') as stream:
+            sources[os.path.basename(path)] = hashlib.sha256(stream.read()).hexdigest()
+        stats[os.path.basename(path)] = [stat.st_mtime_ns, stat.st_size]
+
+    header = {'sha256': hashlib.sha256(payload).hexdigest(), 'byteorder': sys.byteorder, 'width': len(key.columns),
+              'sources': sources, 'stats': stats, 'sections': layout}
+    encoded = json.dumps(header, sort_keys=True).encode('utf-8')
+    encoded += b' ' * (-(_preamble.size + len(encoded)) % 8)
+
+    temp = destination + '.tmp'
+    with open(temp, 'wb') as stream:
+        stream.write(_preamble.pack(magic, bundle_version, len(encoded)))
+        stream.write(encoded)
+        stream.write(payload)
+    os.replace(temp, destination)
+
+    return destination
+
+
+def build_set(demo=is_demo, directory=app_root):
+    """Build the bundle of a content set from its source files in a directory, returning its path"""
+    paths = [os.path.join(directory, name) for name in source_files(demo)]
+
+    return build(*paths, os.path.join(directory, bundle_file(demo)))
+
+
+def main(argv=None):
+    """Parse the command line and build a content bundle"""
+    parser = argparse.ArgumentParser(description="Compile a content set into a memory-mapped bundle")
+    parser.add_argument('--production', action='store_true', help="Build the production set rather than the demo")
+    parser.add_argument('--verify', action='store_true',
+                        help="Open the bundle afterwards and compare it to its sources")
+    args = parser.parse_args(argv)
+
+    path = build_set(not args.production)
+    print("Built {} ({} bytes)".format(path, os.path.getsize(path)))
+
+    if args.verify:
+        verify(path, *[os.path.join(app_root, name) for name in source_files(not args.production)])
+        print("Bundle matches its sources")
+
+
+def verify(path, questions_path, convert_key_path, config_path):
+    """Check that a bundle is undamaged and holds exactly the content of its source files, raising ValueError if not"""
+    bundle = Bundle(path, verify=True)
+    bank, expected_bank = bundle.question_bank(), question_bank.QuestionBank.load(questions_path)
+    key, expected_key = bundle.convert_key(), convert_key.ConvertKey.from_yaml(convert_key_path)
+    with open(config_path, 'r') as stream:
+        expected_config = yaml.safe_load(stream)
+
+    if [bank.question(i) for i in range(len(bank.types))] != \
+            [expected_bank.question(i) for i in range(len(expected_bank.types))]:
+        raise ValueError("Questions differ from {}".format(questions_path))
+    if key.lookup(range(convert_key.n_slots)) != expected_key.lookup(range(convert_key.n_slots)):
+        raise ValueError("Convert key differs from {}".format(convert_key_path))
+    if bundle.config() != expected_config:
+        raise ValueError("Config differs from {}".format(config_path))
+
+
+if __name__ == '__main__':
+    main()
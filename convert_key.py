@@ -0,0 +1,357 @@
+# -*- coding: utf-8 -*-
+"""This module compiles the convert key - the translation from ranked categories to results - into a dense table"""
+
+import hashlib
+import os
+import pickle
+import sqlite3
+import sys
+import threading
+import time
+from array import array
+
+import yaml
+
+import scoring
+from gbl_env import source_matches
+
+# Version of the compiled cache layout - bump whenever ConvertKey's attributes change
+cache_version = 1
+
+# Version of the SQLite database layout - bump whenever import_yaml's tables change
+database_version = 2
+
+# Marker for a table slot with no results, and the size of the dense table (one slot per ordered category triple)
+empty = -1
+n_slots = scoring.n_categories ** 3
+
+
+def slot_index(first, second, third):
+    """Return the dense table slot of an ordered triple of category indices"""
+    return (first * scoring.n_categories + second) * scoring.n_categories + third
+
+
+def mask_to_slot(mask):
+    """Return the dense table slot of a 3-digit octal mask as written in the convert key, or empty if invalid"""
+    first, second, third = mask >> 6, (mask >> 3) & 7, mask & 7
+    if mask < 0 or max(first, second, third) >= scoring.n_categories:
+        return empty
+
+    return slot_index(first, second, third)
+
+
+class ConvertKey:
+    """Convert key compiled into a dense, integer-indexed table with results held as columns
+
+            Each slot of the table holds the index of its first result, or empty, and the number of results it has.
+            The results for a slot are therefore rows first[slot] to first[slot] + count[slot] of the columns.
+
+            Args:
+                mapping (dict): Dictionary translating 3-digit octal keys to lists of results, as found in the YAML
+
+            Attributes:
+                first (array: int): Index of the first result row of each slot, or empty
+                count (array: int): Number of result rows of each slot
+                columns (list: list): One sequence per result field, each holding that field for every result row
+    """
+
+    def __init__(self, mapping):
+        """Constructor"""
+        self.first = array('i', [empty]) * n_slots
+        self.count = array('I', [0]) * n_slots
+
+        width = max((len(row) for rows in mapping.values() for row in rows), default=0)
+        self.columns = [[] for _ in range(width)]
+
+        for mask in sorted(mapping):
+            slot = mask_to_slot(mask)
+            if slot == empty or not mapping[mask]:
+                continue
+
+            self.first[slot] = len(self.columns[0])
+            self.count[slot] = len(mapping[mask])
+            for row in mapping[mask]:
+                for i, column in enumerate(self.columns):
+                    value = row[i] if i < len(row) else None
+                    column.append(sys.intern(value) if isinstance(value, str) else value)
+
+    def __len__(self):
+        return len(self.columns[0]) if self.columns else 0
+
+    @property
+    def width(self):
+        """Number of result fields held per result row"""
+        return len(self.columns)
+
+    @classmethod
+    def load(cls, path, cache=True):
+        """Load and compile a convert key YAML file, going through its compiled cache unless told otherwise"""
+        start = time.perf_counter()
+
+        if cache:
+            convert_key, source = load_cached(path)
+        else:
+            convert_key, source = cls.from_yaml(path), 'yaml'
+
+        print("Loaded convert key from {} in {:.1f} ms".format(source, (time.perf_counter() - start) * 1000),
+              file=sys.stderr)
+
+        return convert_key
+
+    @classmethod
+    def from_tables(cls, first, count, columns):
+        """Wrap an already compiled table and columns, such as those held in a content bundle, without copying them"""
+        convert_key = cls.__new__(cls)
+        convert_key.first = first
+        convert_key.count = count
+        convert_key.columns = columns
+
+        return convert_key
+
+    @classmethod
+    def from_yaml(cls, path):
+        """Parse and compile a convert key YAML file"""
+        with open(path, 'r') as stream:
+            return cls(yaml.safe_load(stream) or {})
+
+    def row(self, index):
+        """Return the result fields of a single result row as a new list"""
+        return [column[index] for column in self.columns]
+
+    def rows(self, slot):
+        """Return the range of result rows held by a slot, empty if it has none"""
+        start = self.first[slot]
+        if start == empty:
+            return range(0)
+
+        return range(start, start + self.count[slot])
+
+    def lookup(self, slots):
+        """Return a dictionary of the result rows of every given slot that has any, each row a new list"""
+        return {slot: [self.row(index) for index in self.rows(slot)] for slot in slots if self.first[slot] != empty}
+
+    def table(self, slots):
+        """Return (columns, found) for the given slots, found mapping each slot that has any results to their rows
+
+                The columns are the convert key's own, so results drawn from them share its data.
+        """
+        return self.columns, {slot: self.rows(slot) for slot in slots if self.first[slot] != empty}
+
+
+class SqliteConvertKey:
+    """Convert key held in an SQLite database and queried on demand, so memory stays flat however large it grows
+
+            Results are stored one row per result, indexed by slot, and a ranking's slots are fetched in one query.
+            The connection is shared between threads behind a lock.
+
+            Args:
+                path (str): Path to a database created by import_yaml
+
+            Attributes:
+                path (str): Path to the database
+                width (int): Number of result fields held per result row
+    """
+
+    def __init__(self, path):
+        """Constructor"""
+        self.path = path
+
+        self._connection = sqlite3.connect('file:{}?mode=ro'.format(path), uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+
+        self.width = self.meta('width')
+        self._fields = ", ".join("field_{}".format(i) for i in range(self.width))
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def meta(self, name):
+        """Return a value recorded in the database's meta table, or None if it has none"""
+        with self._lock:
+            row = self._connection.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+
+        return row[0] if row else None
+
+    def matches(self, path):
+        """Whether the database was imported from the current content of a convert key YAML file"""
+        return source_matches(path, self.meta('source_sha256'), self.meta('source_mtime_ns'), self.meta('source_size'))
+
+    def lookup(self, slots):
+        """Return a dictionary of the result rows of every given slot that has any, each row a new list"""
+        slots = sorted(set(slots))
+        if not slots:
+            return {}
+
+        query = "SELECT slot, {} FROM results WHERE slot IN ({}) ORDER BY slot, position".format(
+            self._fields, ", ".join("?" * len(slots)))
+        with self._lock:
+            rows = self._connection.execute(query, slots).fetchall()
+
+        found = {}
+        for row in rows:
+            found.setdefault(row[0], []).append(list(row[1:]))
+
+        return found
+
+    def table(self, slots):
+        """Return (columns, found) for the given slots, found mapping each slot that has any results to their rows
+
+                The columns are built afresh from one query, with repeated texts shared.
+        """
+        columns = [[] for _ in range(self.width)]
+        found = {}
+        for slot, rows in self.lookup(slots).items():
+            found[slot] = range(len(columns[0]), len(columns[0]) + len(rows)) if columns else range(0)
+            for row in rows:
+                for column, value in zip(columns, row):
+                    column.append(sys.intern(value) if isinstance(value, str) else value)
+
+        return columns, found
+
+    def close(self):
+        """Close the database connection"""
+        self._connection.close()
+
+
+def database_path(path):
+    """Return the path of the SQLite database that stands in for a convert key YAML file"""
+    return os.path.splitext(path)[0] + '.sqlite'
+
+
+def open_key(path):
+    """Open the convert key at a YAML path, preferring an SQLite database of the same name if one has been imported
+
+            A database imported from an earlier version of the YAML file, or by an earlier version of import_yaml, is
+            ignored, with a warning, and the YAML file is loaded instead until the database is imported again.
+    """
+    database = database_path(path)
+    if os.path.exists(database):
+        convert_key = SqliteConvertKey(database)
+        if not os.path.exists(path) or (convert_key.meta('version') == database_version and convert_key.matches(path)):
+            return convert_key
+
+        convert_key.close()
+        print("Ignoring {}, it is out of date with {} and needs importing again".format(database, path),
+              file=sys.stderr)
+
+    return ConvertKey.load(path)
+
+
+def import_yaml(path, destination=None):
+    """Import a convert key YAML file into a new SQLite database, replacing any existing one. Returns its path"""
+    destination = destination or database_path(path)
+
+    stat = os.stat(path)
+    with open(path, 'rb') as stream:
+        content = stream.read()
+    mapping = yaml.safe_load(content) or {}
+    width = max((len(row) for rows in mapping.values() for row in rows), default=0)
+
+    temp = destination + '.tmp'
+    if os.path.exists(temp):
+        os.remove(temp)
+
+    connection = sqlite3.connect(temp)
+    try:
+        with connection:
+            # Fields are left untyped, so numbers keep their type rather than being converted to text
+            fields = "".join(", field_{}".format(i) for i in range(width))
+            connection.execute("CREATE TABLE meta (name TEXT PRIMARY KEY, value)")
+            connection.execute("CREATE TABLE results (slot INTEGER, position INTEGER{}, "
+                               "PRIMARY KEY (slot, position)) WITHOUT ROWID".format(fields))
+            connection.executemany("INSERT INTO meta VALUES (?, ?)",
+                                   [('version', database_version), ('width', width),
+                                    ('source_sha256', hashlib.sha256(content).hexdigest()),
+                                    ('source_mtime_ns', stat.st_mtime_ns), ('source_size', stat.st_size)])
+
+            insert = "INSERT INTO results VALUES (?, ?{})".format(", ?" * width)
+            for mask in sorted(mapping):
+                slot = mask_to_slot(mask)
+                if slot == empty:
+                    continue
+                connection.executemany(insert, ([slot, position] + list(row) + [None] * (width - len(row))
+                                                for position, row in enumerate(mapping[mask])))
+    finally:
+        connection.close()
+
+    os.replace(temp, destination)
+
+    return destination
+
+
+def cache_path(path):
+    """Return the path of the compiled cache written next to a convert key YAML file"""
+    return path + '.cache'
+
+
+def load_cached(path):
+    """Return (convert key, source) from the compiled cache if it is fresh, rebuilding the cache when it is stale
+
+            The cache holds a header followed by the pickled ConvertKey, and is only rebuilt if the content changed.
+    """
+    stat = os.stat(path)
+    header = read_cache_header(path)
+
+    if header and source_matches(path, header['sha256'], header['mtime_ns'], header['size']):
+        convert_key = read_cache(path)
+        if convert_key is not None:
+            # Record the new time of a source that was only touched, so it is trusted without hashing next time
+            if (header['mtime_ns'], header['size']) != (stat.st_mtime_ns, stat.st_size):
+                write_cache(path, convert_key, header['sha256'], stat)
+            return convert_key, 'cache'
+
+    with open(path, 'rb') as stream:
+        content = stream.read()
+    digest = hashlib.sha256(content).hexdigest()
+
+    convert_key = ConvertKey(yaml.safe_load(content) or {})
+    write_cache(path, convert_key, digest, stat)
+
+    return convert_key, 'yaml'
+
+
+def read_cache_header(path):
+    """Return the header of a convert key's compiled cache, or None if it is missing, unreadable or outdated"""
+    try:
+        with open(cache_path(path), 'rb') as stream:
+            header = pickle.load(stream)
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+        return None
+
+    if not isinstance(header, dict) or header.get('version') != cache_version:
+        return None
+
+    return header
+
+
+def read_cache(path):
+    """Return the ConvertKey held in a compiled cache, or None if it cannot be read"""
+    try:
+        with open(cache_path(path), 'rb') as stream:
+            pickle.load(stream)
+            convert_key = pickle.load(stream)
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError, AttributeError):
+        return None
+
+    return convert_key if isinstance(convert_key, ConvertKey) else None
+
+
+def write_cache(path, convert_key, digest, stat):
+    """Write a compiled cache next to a convert key, replacing any previous cache atomically. Failures are ignored"""
+    header = {'version': cache_version, 'sha256': digest, 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+    temp = cache_path(path) + '.tmp'
+
+    try:
+        with open(temp, 'wb') as stream:
+            pickle.dump(header, stream, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(convert_key, stream, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp, cache_path(path))
+    except OSError:
+        # A read-only install still works, it just parses the YAML every launch
+        pass
+
+
+if __name__ == '__main__':
+    # Import a convert key YAML file into its SQLite database, e.g. python convert_key.py convert_key_production.yaml
+    print("Imported into {}".format(import_yaml(sys.argv[1])))
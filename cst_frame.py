@@ -3,49 +3,65 @@
 
 import os
 import sys
+import threading
 import wx
-import random
-import yaml
 
+import content_bundle
 import cst_pane
+import convert_key
+import gbl_assets
+import perf_trace
+import question_bank
+import scoring
 import config
+from gbl_env import app_root, is_demo, resident_marker
 
-is_demo = True
-
-# Handle whether we are frozen
-if getattr(sys, 'frozen', False):
-    app_root = sys._MEIPASS
-else:
-    app_root = os.path.dirname(os.path.abspath(__file__))
-
+# Exit status of a cold start, set to 1 once a window has been closed because its content failed to load
+exit_status = 0
 
 class MainApp(wx.Frame):
     """Quiz application frame.
 
+            Class Variables:
+                pane_order (tuple: str): Panes built after the cover, in the order they are built in the background
+                questions_per_type (int): If set, sample this many questions of each type instead of loading them all
+                adaptive (bool): End the quiz early once further answers can no longer change the results
+                preloaded (tuple): Question bank and convert key shared by every window, if loaded by preload_content
+
             Attributes:
-                questions (list: [str, int]): A list of questions, each a 2-entry list of question and type
+                questions (QuestionBank): Shuffled question bank, handing out pages of [question, type] entries
                 scoring (list: int): Cumulative score throughout the test
                 ranking (list): List of score indices, ranked high to low
-                results (list: list): List of returned texts based on 3-digit octal key
-                convert_key (dict) Dictionary translating 3-digit octal keys to applicable results
+                results (ResultSet): Results shown so far, looked up from the 3-digit octal key
+                convert_key (ConvertKey) Compiled table or SQLite store translating ranked category triples to applicable results
+                content_loaded (threading.Event): Set once the questions, convert key and config have been loaded
+                content_error (Exception): Error raised while loading content, if any
+                session (int): Number of the current subject's session, counting from 0
+                spare_session (int): Session whose successor has been prepared in advance, if any
+                on_cover_shown (callable): Called once the cover image is first displayed, if set
     """
 
+    pane_order = ('instruct', 'quiz', 'summary')
+    questions_per_type = None
+    adaptive = False
+    preloaded = None
+
+    @perf_trace.span('MainApp.__init__')
     def __init__(self, *args, **kwargs):
         wx.Frame.__init__(self, *args, **kwargs)
 
-        # Load questions and shuffle
-        self.questions = []
-        self.load_questions()
-        random.shuffle(self.questions)
-
         # Initialize variables
-        self.scoring = [0] * 7
+        self.questions = None
+        self.scoring = [0] * scoring.n_categories
         self.ranking = []
-        self.results = []
-        self.convert_key = {}
-        self.load_convert_key()
-
-        config.load_config()
+        self.results = scoring.ResultSet()
+        self.convert_key = None
+        self.content_loaded = threading.Event()
+        self.content_error = None
+        self._panes = {}
+        self.session = 0
+        self.spare_session = None
+        self.on_cover_shown = None
 
         # Pane sizers
         self.sizer_cover = wx.BoxSizer(wx.VERTICAL)
@@ -53,57 +69,230 @@ class MainApp(wx.Frame):
         self.sizer_quiz = wx.BoxSizer(wx.VERTICAL)
         self.sizer_summary = wx.BoxSizer(wx.VERTICAL)
 
-        # Load all panels and place in their sizers
+        # Only the cover is built up front, the other panes are built once content has loaded or when first needed
         self.pane_cover = cst_pane.PaneCover(self)
-        self.pane_instruct = cst_pane.PaneInstruct(self)
-        self.pane_quiz = cst_pane.PaneTest(self)
-        self.pane_summary = cst_pane.PaneSummary(self)
         self.sizer_cover.Add(self.pane_cover, proportion=1, flag=wx.EXPAND)
-        self.sizer_instruct.Add(self.pane_instruct, proportion=1, flag=wx.EXPAND)
-        self.sizer_quiz.Add(self.pane_quiz, proportion=1, flag=wx.EXPAND)
-        self.sizer_summary.Add(self.pane_summary, proportion=1, flag=wx.EXPAND)
-
-        # Only show the cover initially
-        self.pane_instruct.Hide()
-        self.pane_quiz.Hide()
-        self.pane_summary.Hide()
 
         # Set initial sizer and show self
         self.SetSizer(self.sizer_cover)
         self.Show()
 
+        # Decode the quiz pane's icons ahead of it being built
+        gbl_assets.preload(['r_arr.png'])
+
+        # Load questions, convert key and config off the main thread while the cover is displayed
+        threading.Thread(target=self.load_content, daemon=True).start()
+
+    @property
+    def pane_instruct(self):
+        """Instructions pane, built on first use"""
+        return self.build_pane('instruct')
+
+    @property
+    def pane_quiz(self):
+        """Quiz pane, built on first use"""
+        return self.build_pane('quiz')
+
+    @property
+    def pane_summary(self):
+        """Summary pane, built on first use"""
+        return self.build_pane('summary')
+
+    @classmethod
+    @perf_trace.span('MainApp.preload_content')
+    def preload_content(cls):
+        """Load the questions, convert key and config once, to be shared by every window opened afterwards"""
+        cls.preloaded = (cls.read_questions(), cls.read_convert_key())
+        config.load_config()
+
+    @perf_trace.span('MainApp.load_content', 'worker')
+    def load_content(self):
+        """Load and shuffle the questions, then load and check the convert key and config. Runs on a worker thread"""
+        try:
+            if MainApp.preloaded:
+                bank, self.convert_key = MainApp.preloaded
+                self.questions = bank.clone()
+            else:
+                self.load_questions()
+                self.load_convert_key()
+                config.load_config()
+            config.check_fields(config.settings, self.convert_key.width)
+            self.questions.shuffle()
+        except Exception as error:
+            # Reported on the main thread by build_next_pane
+            self.content_error = error
+        finally:
+            self.content_loaded.set()
+
+        wx.CallAfter(self.build_next_pane)
+
+    def build_next_pane(self):
+        """Build the next pane not yet built, scheduling the one after so the event loop keeps running in between"""
+
+        # The frame may have been closed before content finished loading
+        if not self:
+            return
+
+        if self.content_error:
+            self.report_content_error()
+            return
+
+        for name in MainApp.pane_order:
+            if name not in self._panes:
+                self.build_pane(name)
+                wx.CallAfter(self.build_next_pane)
+                return
+
+    def report_content_error(self):
+        """Report content that failed to load and close the window, which no subject could complete without it"""
+        global exit_status
+
+        perf_trace.instant('content_error', error=str(self.content_error))
+        print("Could not load the quiz content: {}".format(self.content_error), file=sys.stderr)
+        exit_status = 1
+        self.Close()
+
+    @perf_trace.span('MainApp.build_pane')
+    def build_pane(self, name):
+        """Return a pane, first waiting for content and building it, hidden, in its sizer if it does not exist yet"""
+        if name not in self._panes:
+            self.content_loaded.wait()
+            if self.content_error:
+                raise self.content_error
+
+            if name == 'instruct':
+                pane, sizer = cst_pane.PaneInstruct(self), self.sizer_instruct
+            elif name == 'quiz':
+                pane, sizer = cst_pane.PaneTest(self), self.sizer_quiz
+            else:
+                pane, sizer = cst_pane.PaneSummary(self), self.sizer_summary
+            pane.Hide()
+            sizer.Add(pane, proportion=1, flag=wx.EXPAND)
+            self._panes[name] = pane
+
+        return self._panes[name]
+
+    def prepare_session(self):
+        """Prepare a warm spare session for the next subject, shuffling on a worker thread then filling the quiz pane"""
+        session = self.session
+
+        def shuffle():
+            wx.CallAfter(self.install_spare, self.questions.shuffled_order(), session)
+
+        threading.Thread(target=shuffle, daemon=True).start()
+
+    def install_spare(self, order, session):
+        """Load a prepared question order into the bank and quiz pane, unless the next session has already started"""
+        if not self or session != self.session:
+            return
+
+        self.questions.reset(order)
+        self.pane_quiz.reset()
+        self.spare_session = session
+
+    def reset_session(self):
+        """Start the next subject, returning every pane to a fresh state with its widgets reused, and show the cover"""
+        if self.spare_session != self.session:
+            self.questions.reset()
+            self.pane_quiz.reset()
+        self.session += 1
+
+        # Initialize variables
+        self.scoring = [0] * scoring.n_categories
+        self.ranking = []
+        self.results = scoring.ResultSet()
+
+        # Clear the summary and return to the cover
+        self.pane_summary.reset()
+        for pane in self._panes.values():
+            pane.Hide()
+        self.pane_cover.Show()
+        self.SetSizer(self.sizer_cover, deleteOld=False)
+        self.pane_cover.SetFocus()
+        self.Layout()
+
     def load_questions(self):
         """Load the questions file and populate self.questions"""
+        self.questions = MainApp.read_questions()
+
+    def load_convert_key(self):
+        """Load the parameters key"""
+        self.convert_key = MainApp.read_convert_key()
+
+        # Results cached against the previous key are no longer valid
+        scoring.result_cache.clear()
+
+    @staticmethod
+    @perf_trace.span('MainApp.read_questions', 'loader')
+    def read_questions():
+        """Return the question bank read from the content bundle, or else from the questions file"""
+        bundle = content_bundle.current()
+        if bundle and not MainApp.questions_per_type:
+            return bundle.question_bank()
+
         if is_demo:
             _file = 'questions_demo.txt'
         else:
             _file = 'questions_production.txt'
 
-        with open(os.path.join(app_root, _file), 'r') as file:
-            for line in file:
-                _type, _question = line.strip().split(" :: ")
-                self.questions.append([_question, int(_type)])
+        # Very large banks are sampled per question type while streaming, rather than loaded whole
+        if MainApp.questions_per_type:
+            return question_bank.QuestionBank.sample(os.path.join(app_root, _file), MainApp.questions_per_type)
+
+        return question_bank.QuestionBank.load(os.path.join(app_root, _file))
+
+    @staticmethod
+    @perf_trace.span('MainApp.read_convert_key', 'loader')
+    def read_convert_key():
+        """Return the convert key read from the content bundle, or else from its database or YAML file"""
+        bundle = content_bundle.current()
+        if bundle:
+            return bundle.convert_key()
 
-    def load_convert_key(self):
-        """Load the parameters key"""
         if is_demo:
             _file = 'convert_key_demo.yaml'
         else:
             _file = 'convert_key_production.yaml'
 
-        with open(os.path.join(app_root, _file), 'r') as stream:
-            self.convert_key = yaml.safe_load(stream)
+        return convert_key.open_key(os.path.join(app_root, _file))
 
 
-def main():
-    """Run application as full-screen window"""
-    app = wx.App()
+def open_window():
+    """Open a full-screen quiz window"""
     window = MainApp(None, size=(700, 500), style=wx.NO_BORDER)
     window.Maximize(True)
     window.Show(True)
 
+    return window
+
+
+def main():
+    """Run application as full-screen window, or as the resident process with --resident"""
+
+    # --adaptive ends each quiz as soon as further answers can no longer change its results
+    MainApp.adaptive = '--adaptive' in sys.argv
+
+    if '--resident' in sys.argv:
+        import resident
+        resident.serve()
+        return
+
+    app = wx.App()
+    window = open_window()
+
+    # Used by the launch measurement harness to time a cold start up to the cover
+    if '--exit-on-cover' in sys.argv:
+        def cover_shown():
+            print(resident_marker, flush=True)
+            window.Close()
+        window.on_cover_shown = cover_shown
+
     app.MainLoop()
 
+    gbl_assets.report()
+
+    return exit_status
+
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
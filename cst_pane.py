@@ -1,71 +1,109 @@
 # -*- coding: utf-8 -*-
 """This module defines panes - master panels that act as direct children of the progenitor frame"""
 
+import hashlib
 import os
+import threading
 import wx
-import itertools
 
 import cst_panel
 import cst_widget
+import gbl_assets
 import gbl_colors
+import perf_trace
 import config
-from cst_frame import app_root, is_demo
-
-
-def list_max_index(ls, n):
-    """Takes a list of numbers and returns the n max indices from max to min. Ties are returned as tuples at index"""
-    ls_return = []
-
-    reverse_ordered_list = list(reversed(sorted(set(ls))))
-
-    try:
-        for k in range(n):
-            ls_return.append([i for i, j in enumerate(ls) if j == reverse_ordered_list[k]])
-    except IndexError:
-        pass
-
-    return ls_return
+import scoring
+from gbl_env import is_demo
 
 
 class PaneCover(wx.Panel):
     """Master pane that acts as the landing page of the application
 
+            The cover image is decoded and scaled to the display on a worker thread while a plain placeholder is shown.
+            Each scaled image is cached on disk per source image and display resolution, so later launches on the same
+            hardware load a ready-sized image.
+
             Args:
                 parent (ptr): Reference to the wx.object this panel belongs to
 
             Attributes:
                 parent (ptr): Reference to the wx.object this panel belongs to
+                image_bitmap (wx.StaticBitmap): Cover image, empty until it has been decoded
     """
 
+    @perf_trace.span('PaneCover.__init__')
     def __init__(self, parent, *args, **kwargs):
         """Constructor"""
         wx.Panel.__init__(self, parent, *args, **kwargs)
 
         self.parent = parent
 
-        # Load cover image
-        if is_demo:
-            image = wx.Image(os.path.join(app_root, 'img', 'cover_demo.jpg'))
-        else:
-            image = wx.Image(os.path.join(app_root, 'img', 'cover_production.jpg'))
-        (w1, h1) = image.GetSize()
-        (w2, h2) = wx.GetDisplaySize()
+        # Placeholder shown until the cover image is ready
+        self.SetBackgroundColour(gbl_colors.background)
+        self.image_bitmap = wx.StaticBitmap(self)
 
-        # Resize accordingly
-        if w1 / h1 < w2 / h2:
-            image_bitmap = wx.StaticBitmap(self, bitmap=wx.Bitmap(image.Rescale(w2, h1 * w2 / w1)))
+        # Decode and scale the cover image off the main thread
+        if is_demo:
+            name = 'cover_demo.jpg'
         else:
-            image_bitmap = wx.StaticBitmap(self, bitmap=wx.Bitmap(image.Rescale(w1 * h2 / h1, h2)))
+            name = 'cover_production.jpg'
+        cache_dir = os.path.join(wx.StandardPaths.Get().GetUserLocalDataDir(), 'cache')
+        threading.Thread(target=self.load_cover, args=(name, wx.GetDisplaySize(), cache_dir), daemon=True).start()
 
         # Bind keypresses to an event that governs their behaviour
         self.Bind(wx.EVT_CHAR_HOOK, self.event_keypress)
 
         # Main Sizer
         self.sizer = wx.BoxSizer(wx.VERTICAL)
-        self.sizer.Add(image_bitmap, proportion=1, flag=wx.ALL | wx.EXPAND)
+        self.sizer.Add(self.image_bitmap, proportion=1, flag=wx.ALL | wx.EXPAND)
 
         self.SetSizer(self.sizer)
 
+    def load_cover(self, name, display_size, cache_dir):
+        """Load the cover image scaled to the display, from the disk cache if possible. Runs on a worker thread"""
+        (w2, h2) = display_size
+
+        with open(gbl_assets.path(name), 'rb') as stream:
+            digest = hashlib.sha256(stream.read()).hexdigest()[:16]
+        cache_path = os.path.join(cache_dir, 'cover_{}_{}x{}.bmp'.format(digest, w2, h2))
+
+        if os.path.exists(cache_path):
+            image = wx.Image(cache_path, wx.BITMAP_TYPE_BMP)
+        else:
+            source = gbl_assets.get_image(name)
+            (w1, h1) = source.GetSize()
+
+            # Resize accordingly, leaving the shared source image untouched
+            if w1 / h1 < w2 / h2:
+                image = source.Scale(w2, int(h1 * w2 / w1))
+            else:
+                image = source.Scale(int(w1 * h2 / h1), h2)
+
+            # Failing to cache only costs the rescale on the next launch
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                image.SaveFile(cache_path + '.tmp', wx.BITMAP_TYPE_BMP)
+                os.replace(cache_path + '.tmp', cache_path)
+            except OSError:
+                pass
+
+        wx.CallAfter(self.show_cover, image)
+
+    def show_cover(self, image):
+        """Display the decoded cover image in place of the placeholder"""
+
+        # The frame may have been closed before the image was ready
+        if not self:
+            return
+
+        self.image_bitmap.SetBitmap(wx.Bitmap(image))
+        self.Layout()
+
+        if self.parent.on_cover_shown:
+            self.parent.on_cover_shown()
+            self.parent.on_cover_shown = None
+
+    @perf_trace.input_span('PaneCover.event_keypress')
     def event_keypress(self, event):
         """Reads keypresses and deals with their events"""
 
@@ -81,15 +119,17 @@ class PaneCover(wx.Panel):
                 self.parent.Close()
                 return
 
+    @perf_trace.span('PaneCover.event_change_pane')
     def event_change_pane(self, event):
         """Toggle frame's sizer to correspond to the instructions pane"""
 
-        # Only proceed if this pane is active
-        if self.IsShown():
+        # Only proceed if this pane is active, and until content has loaded leave the cover up rather than wait
+        if self.IsShown() and self.parent.content_loaded.is_set() and not self.parent.content_error:
+            pane = self.parent.pane_instruct
             self.Hide()
-            self.parent.pane_instruct.Show()
-            self.parent.pane_instruct.SetFocus()
-            self.parent.SetSizer(self.parent.sizer_instruct)
+            pane.Show()
+            pane.SetFocus()
+            self.parent.SetSizer(self.parent.sizer_instruct, deleteOld=False)
             self.parent.Layout()
 
 
@@ -103,6 +143,7 @@ class PaneInstruct(wx.Panel):
                 parent (ptr): Reference to the wx.object this panel belongs to
     """
 
+    @perf_trace.span('PaneInstruct.__init__')
     def __init__(self, parent, *args, **kwargs):
         """Constructor"""
         wx.Panel.__init__(self, parent, *args, **kwargs)
@@ -120,7 +161,7 @@ class PaneInstruct(wx.Panel):
 
         # Instructions
         instruct_header = wx.StaticText(self, size=(-1, -1), label="Instructions:")
-        instruct = wx.TextCtrl(self, -1, config.instructions +
+        instruct = wx.TextCtrl(self, -1, config.settings.instructions +
                                "\r\n\r\n You can navigate this quiz either by clicking your answers "
                                "manually. If you would prefer to answer using the keyboard, press TAB to "
                                "enter keyboard mode. The controls are as follows:\r\n > Keys 1-4 answer "
@@ -149,6 +190,7 @@ class PaneInstruct(wx.Panel):
 
         self.Layout()
 
+    @perf_trace.input_span('PaneInstruct.event_keypress')
     def event_keypress(self, event):
         """Reads keypresses and deals with their events"""
 
@@ -163,32 +205,41 @@ class PaneInstruct(wx.Panel):
             if event.GetKeyCode() == wx.WXK_ESCAPE:
                 self.parent.Close()
 
+    @perf_trace.span('PaneInstruct.event_change_pane')
     def event_change_pane(self, event):
         """Toggle frame's sizer to correspond to the quiz pane"""
 
-        # Only proceed if this pane is active
+        # Only proceed if this pane is active. The quiz pane is fetched first, so the instructions stay up if it fails
         if self.IsShown():
+            pane = self.parent.pane_quiz
             self.Hide()
-            self.parent.pane_quiz.Show()
-            self.parent.pane_quiz.SetFocus()
-            self.parent.SetSizer(self.parent.sizer_quiz)
+            pane.Show()
+            pane.SetFocus()
+            self.parent.SetSizer(self.parent.sizer_quiz, deleteOld=False)
             self.parent.Layout()
 
 
 class PaneTest(wx.Panel):
     """Master pane that handles the quiz portion of the application
 
+            Questions are shown on one of two pages of radio boxes. While a page is answered, the other is filled with
+            the next questions during idle time, so moving on to the next set is a single swap of pages.
+
             Args:
                 parent (ptr): Reference to the wx.object this panel belongs to
 
             Attributes:
                 parent (ptr): Reference to the wx.object this panel belongs to
                 quantity (int): Integer count of the number of questions to populate - based on your screen size
-                radio_boxes (list: ptr->wx.widget): List of pointers to all radio box widgets generated
+                book (wx.Simplebook): Holds the two pages of radio boxes, showing one at a time
+                pages (list: list): Radio box widgets of each page
+                radio_boxes (list: ptr->wx.widget): List of pointers to the radio box widgets of the page shown
                 current_questions (list: list): List of all questions to be shown in current set of questions
+                next_questions (list: list): Questions already filled into the hidden page, or None if not yet filled
                 selected_question (int): Current selected question for tab-through handling. -1 indicates no selection
     """
 
+    @perf_trace.span('PaneTest.__init__')
     def __init__(self, parent, *args, **kwargs):
         """Constructor"""
         wx.Panel.__init__(self, parent, *args, **kwargs)
@@ -196,8 +247,8 @@ class PaneTest(wx.Panel):
         # Attributes
         self.parent = parent
         self.quantity = wx.GetDisplaySize()[1] // (15 + 2 * (15 + 7)) - 2  # Take height (px) and divide by entry size
-        self.radio_boxes = []
         self.current_questions = []
+        self.next_questions = None
         self.selected_question = -1
 
         # Draw Style
@@ -207,14 +258,14 @@ class PaneTest(wx.Panel):
         self.SetBackgroundColour(gbl_colors.background)
 
         # Bordered sizer with text surrounding all quiz questions
-        temp = wx.StaticBox(self, label=config.staticbox_label)
+        temp = wx.StaticBox(self, label=config.settings.staticbox_label)
         self.sizer_bordered = wx.StaticBoxSizer(temp, orient=wx.VERTICAL)
 
-        # Load in radio buttons and place a reference in a list
-        for i in range(self.quantity):
-            rbox = cst_widget.QuizRadioBox(self, config.rbox_labels, gbl_colors.background)
-            self.radio_boxes.append(rbox)
-            self.sizer_bordered.Add(rbox, flag=wx.CENTER | wx.EXPAND)
+        # Two pages of radio buttons, one shown and one being filled with the next questions
+        self.book = wx.Simplebook(self)
+        self.pages = [self.build_page(), self.build_page()]
+        self.radio_boxes = self.pages[0]
+        self.sizer_bordered.Add(self.book, proportion=1, flag=wx.EXPAND)
 
         # Load questions and push them to the radio buttons
         self.pop_questions()
@@ -224,8 +275,9 @@ class PaneTest(wx.Panel):
         button_next = wx.Button(self, label='Next')
         button_next.Bind(wx.EVT_BUTTON, self.event_next_question_set)
 
-        # Bind keypresses to an event that governs their behaviour
+        # Bind keypresses to an event that governs their behaviour, and fill the hidden page when otherwise idle
         self.Bind(wx.EVT_CHAR_HOOK, self.event_keypress)
+        self.Bind(wx.EVT_IDLE, self.event_idle)
 
         # Main Sizer
         self.sizer_main = wx.BoxSizer(wx.VERTICAL)
@@ -234,31 +286,70 @@ class PaneTest(wx.Panel):
 
         self.SetSizer(self.sizer_main)
 
-    def pop_questions(self):
-        """Pop some questions to be ready for display. If there are too few, pop the rest of the questions"""
-        self.current_questions = []
-        if self.quantity < len(self.parent.questions):
-            for i in range(self.quantity):
-                self.current_questions.append(self.parent.questions.pop(0))
-        else:
-            self.current_questions = self.parent.questions
-            self.parent.questions = []
-
-    def push_questions(self):
-        """Push question parameters into radio buttons, hiding any that remain unfilled at the end"""
-        if 0 < len(self.parent.questions):
-            for i in range(self.quantity):
-                self.radio_boxes[i].question_text.SetLabel(self.current_questions[i][0])
-                self.radio_boxes[i].q_type = self.current_questions[i][1]
-        else:
-            for i in range(len(self.current_questions)):
-                self.radio_boxes[i].question_text.SetLabel(self.current_questions[i][0])
-                self.radio_boxes[i].q_type = self.current_questions[i][1]
-            for i in range(self.quantity - len(self.current_questions)):
-                self.radio_boxes[i + len(self.current_questions)].Hide()
+    def build_page(self):
+        """Add a page of radio buttons to the book, returning its radio boxes"""
+        page = wx.Panel(self.book)
+        page.SetBackgroundColour(gbl_colors.background)
+        sizer = wx.BoxSizer(wx.VERTICAL)
 
-            self.Layout()
+        # Load in radio buttons and place a reference in a list
+        radio_boxes = []
+        for i in range(self.quantity):
+            rbox = cst_widget.QuizRadioBox(page, config.settings.rbox_labels, gbl_colors.background)
+            radio_boxes.append(rbox)
+            sizer.Add(rbox, flag=wx.CENTER | wx.EXPAND)
+
+        page.SetSizer(sizer)
+        self.book.AddPage(page, "")
+
+        return radio_boxes
+
+    def hidden_page(self):
+        """Return the radio boxes of the page not shown"""
+        return self.pages[1 - self.book.GetSelection()]
+
+    def pop_questions(self, prefer=None):
+        """Pop some questions to be ready for display, favouring any preferred types. If there are too few, pop the rest"""
+        self.current_questions = self.parent.questions.next_page(self.quantity, prefer)
 
+    def push_questions(self, radio_boxes=None, questions=None):
+        """Push questions into a page's radio buttons, by default the shown page's, hiding any left unfilled"""
+        radio_boxes = self.radio_boxes if radio_boxes is None else radio_boxes
+        questions = self.current_questions if questions is None else questions
+
+        for rbox, (question, q_type) in zip(radio_boxes, questions):
+            rbox.question_text.SetLabel(question)
+            rbox.q_type = q_type
+            rbox.set_selection(0)
+            rbox.Show()
+        for rbox in radio_boxes[len(questions):]:
+            rbox.Hide()
+
+        radio_boxes[0].GetParent().Layout()
+
+    def event_idle(self, event):
+        """Fill the hidden page with the next questions, if they are known ahead of the current page's answers"""
+        event.Skip()
+
+        # Adaptive mode picks the next questions from the answers, so they can only be filled in once given
+        if self.next_questions is None and not self.parent.adaptive and len(self.parent.questions) > 0:
+            self.next_questions = self.parent.questions.next_page(self.quantity)
+            self.push_questions(self.hidden_page(), self.next_questions)
+
+    def swap_pages(self):
+        """Show the hidden page in place of the current one, moving any selection to its first question"""
+        selected = self.selected_question >= 0
+        self.select(-1)
+
+        self.book.ChangeSelection(1 - self.book.GetSelection())
+        self.radio_boxes = self.pages[self.book.GetSelection()]
+        self.current_questions = self.next_questions
+        self.next_questions = None
+
+        if selected:
+            self.select(0)
+
+    @perf_trace.input_span('PaneTest.event_keypress')
     def event_keypress(self, event):
         """Reads keypresses and deals with their events"""
 
@@ -288,6 +379,7 @@ class PaneTest(wx.Panel):
                 self.select_next()
                 return
 
+    @perf_trace.span('PaneTest.event_next_question_set')
     def event_next_question_set(self, event):
         """Load next set of questions or toggle frame's sizer to correspond to the summary pane"""
 
@@ -297,96 +389,109 @@ class PaneTest(wx.Panel):
                 if rbox.get_selection() == 0 and rbox.IsShown():
                     return
 
-            # Commit scoring results
-            for rbox in self.radio_boxes:
-                self.parent.scoring[rbox.q_type] += rbox.get_selection()
-
-            # If there are more questions, pop/push a set and reset the radio buttons to no selection
-            if len(self.parent.questions) > 0:
-                self.select_first()
-                self.pop_questions()
-                self.push_questions()
-
-                # Reset radio buttons
-                for rbox in self.radio_boxes:
-                    rbox.set_selection(0)
+            # Commit scoring results, from the rows in use only - spare rows of a partly filled page may have no type
+            for rbox, (_, q_type) in zip(self.radio_boxes, self.current_questions):
+                self.parent.scoring[q_type] += rbox.get_selection()
+
+            # In adaptive mode, finish early once further answers can no longer change the results
+            finished = self.next_questions is None and len(self.parent.questions) == 0
+            unresolved = None
+            if self.parent.adaptive and not finished:
+                unresolved = scoring.unresolved_categories(self.parent.scoring,
+                                                           self.parent.questions.remaining_by_type(),
+                                                           len(config.settings.rbox_labels))
+                finished = not unresolved
+
+            # If there are more questions, swap in the page of them filled in ahead, filling it now if it is not
+            if not finished:
+                if self.next_questions is None:
+                    self.next_questions = self.parent.questions.next_page(self.quantity, unresolved)
+                    self.push_questions(self.hidden_page(), self.next_questions)
+                self.swap_pages()
 
             # Otherwise, toggle frame's sizer to correspond to the summary pane and carry out ranking
             else:
                 self.Hide()
                 self.parent.pane_summary.Show()
-                self.parent.SetSizer(self.parent.sizer_summary)
+                self.parent.SetSizer(self.parent.sizer_summary, deleteOld=False)
                 self.parent.pane_summary.SetFocus()
                 self.parent.Layout()
 
                 # Determine the proper ranking (indices) of scores and determine your results from the key
-                self.parent.ranking = list_max_index(self.parent.scoring, 4)
+                self.parent.ranking = scoring.list_max_index(self.parent.scoring, scoring.n_ranks)
+                perf_trace.instant('ranking', ranking=self.parent.ranking)
 
-                print(self.parent.ranking)
-                self.determine_results()
+                # Look up results on a worker thread, the summary pane fills in as chunks arrive
+                self.parent.pane_summary.begin_results()
+                threading.Thread(target=self.determine_results,
+                                 args=(self.parent.ranking, self.parent.session),
+                                 daemon=True).start()
 
-                # Update the summary pane, freezing and thawing to prevent graphical artifacts on population
-                self.parent.Freeze()
-                self.parent.pane_summary.panel_scroll.refresh()
-                self.parent.Thaw()
+                # Get the next subject's session ready while this one reads their results
+                self.parent.prepare_session()
 
     def select_next(self):
         """Select next radio button"""
         if self.selected_question == -1:
-            self.selected_question = 0
-            self.radio_boxes[0].selected_question(True)
-            self.Layout()
-        elif self.selected_question < len(self.current_questions) - 1:#len(self.radio_boxes) - 1:
-            self.radio_boxes[self.selected_question].selected_question(False)
-            self.selected_question += 1
-            self.radio_boxes[self.selected_question].selected_question(True)
-            self.Layout()
+            self.select(0)
+        elif self.selected_question < len(self.current_questions) - 1:
+            self.select(self.selected_question + 1)
 
     def select_prev(self):
         """Select previous radio button"""
-        if self.selected_question == 0:
-            self.radio_boxes[0].selected_question(False)
-            self.selected_question = -1
-            self.Layout()
-        elif self.selected_question > 0:
-            self.radio_boxes[self.selected_question].selected_question(False)
-            self.selected_question -= 1
-            self.radio_boxes[self.selected_question].selected_question(True)
-            self.Layout()
+        if self.selected_question >= 0:
+            self.select(self.selected_question - 1)
 
     def select_first(self):
         """Select first radio button"""
         if self.selected_question >= 0:
-            self.radio_boxes[self.selected_question].selected_question(False)
-            self.selected_question = 0
-            self.radio_boxes[0].selected_question(True)
-            self.Layout()
-
-    def determine_results(self):
-        """Populate the results based on ranking"""
-
-        print(self.parent.scoring)
-
-        combined_ranks = []
+            self.select(0)
+
+    def select(self, index):
+        """Move the selection arrow to a radio button, or clear it with -1, repainting only the two rows affected"""
+        previous = self.selected_question
+        if previous == index:
+            return
+
+        if previous >= 0:
+            self.radio_boxes[previous].selected_question(False)
+            self.radio_boxes[previous].GetParent().RefreshRect(self.radio_boxes[previous].GetRect())
+        self.selected_question = index
+        if index >= 0:
+            self.radio_boxes[index].selected_question(True)
+            self.radio_boxes[index].GetParent().RefreshRect(self.radio_boxes[index].GetRect())
+
+    @perf_trace.span('PaneTest.determine_results', 'worker')
+    def determine_results(self, ranking, session):
+        """Determine the results based on ranking and pass them to the summary pane in chunks. Runs on a worker thread"""
+        perf_trace.instant('scoring', scoring=list(self.parent.scoring))
+        results = scoring.result_cache.get(ranking, self.parent.convert_key, config.settings.initials)
+
+        for start in range(0, len(results), PaneSummary.chunk):
+            chunk = results[start:start + PaneSummary.chunk]
+            wx.CallAfter(self.parent.pane_summary.add_results, chunk, start + len(chunk), len(results), session)
+        # A ranking with no results still hands over its empty result set, so the summary hides its progress
+        if not results:
+            wx.CallAfter(self.parent.pane_summary.add_results, results, 0, 0, session)
+
+    def reset(self):
+        """Return the pane to a fresh state for a new subject, reusing its radio boxes, and push the first questions"""
+        self.select(-1)
+        self.next_questions = None
+        self.book.ChangeSelection(0)
+        self.radio_boxes = self.pages[0]
 
-        for ranks in self.parent.ranking[:3]:
-            combined_ranks.extend(ranks)
-
-        comb = list(itertools.permutations(combined_ranks, 3))
-        for key in comb:
-            mask = oct(key[2] + key[1] * 8 + key[0] * 8 ** 2)
-            self.add_result(mask, "|".join([config.initials[i] for i in key]))
-
-    def add_result(self, mask, rank):
-        try:
-            self.parent.results.extend([i + [rank] for i in self.parent.convert_key[int(mask, 8)]])
-        except KeyError:
-            pass
+        self.pop_questions()
+        self.push_questions()
+        self.Layout()
 
 
 class PaneSummary(wx.Panel):
     """Master pane that handles the quiz portion of the application
 
+                Class Variables:
+                    chunk (int): Number of results passed from the worker thread to the pane at a time
+
                 Args:
                     parent (ptr): Reference to the wx.object this panel belongs to
 
@@ -396,8 +501,12 @@ class PaneSummary(wx.Panel):
                     radio_boxes (list: ptr->wx.widget): List of pointers to all radio box widgets generated
                     current_questions (list: list): List of all questions to be shown in current set of questions
                     selected_question (int): Current selected question for tab-through handling. -1 indicates no selection
+                    gauge (wx.Gauge): Progress of the results being filled in, hidden once they are all shown
     """
 
+    chunk = 250
+
+    @perf_trace.span('PaneSummary.__init__')
     def __init__(self, parent, *args, **kwargs):
         wx.Panel.__init__(self, parent, *args, **kwargs)
 
@@ -414,7 +523,9 @@ class PaneSummary(wx.Panel):
 
         self.listofscores = []
 
-        title_text = wx.StaticText(self, size=(-1, -1), label=config.summary_text)
+        title_text = wx.StaticText(self, size=(-1, -1), label=config.settings.summary_text)
+        self.gauge = wx.Gauge(self, range=1)
+        self.gauge.Hide()
         self.panel_scroll = cst_panel.ScrolledResultsPanel(self)
         #for index, score in enumerate(parent.scoring):
         #    self.listofscores.append(wx.StaticText(self, size=(-1, -1), label="0"))
@@ -422,6 +533,7 @@ class PaneSummary(wx.Panel):
         # Sizer Layout
         self.sizer = wx.BoxSizer(wx.VERTICAL)
         self.sizer.Add(title_text, flag=wx.ALL | wx.EXPAND)
+        self.sizer.Add(self.gauge, flag=wx.ALL | wx.EXPAND)
         self.sizer.Add(wx.StaticLine(self, style=wx.LI_HORIZONTAL), flag=wx.EXPAND)
         self.sizer.Add(self.panel_scroll, proportion=1, flag=wx.ALL | wx.EXPAND)
         #for pleq in self.listofscores:
@@ -429,11 +541,46 @@ class PaneSummary(wx.Panel):
         self.SetSizer(self.sizer)
         self.Layout()
 
+    @perf_trace.input_span('PaneSummary.event_keypress')
     def event_keypress(self, event):
         """Reads keypresses and deals with their events"""
 
         # Only proceed if this pane is active
         if self.IsShown():
+            # Handles the use of ENTER to return to the cover for the next subject
+            if event.GetKeyCode() == wx.WXK_RETURN:
+                self.parent.reset_session()
+                return
+
             # Handles the use of ESC to close application
             if event.GetKeyCode() == wx.WXK_ESCAPE:
                 self.parent.Close()
+
+    def reset(self):
+        """Clear the results shown for the previous subject"""
+        self.gauge.Hide()
+        self.panel_scroll.clear()
+        self.Layout()
+
+    def begin_results(self):
+        """Show the progress gauge while results are determined"""
+        self.gauge.Show()
+        self.gauge.Pulse()
+        self.Layout()
+
+    def add_results(self, chunk, done, total, session):
+        """Append a chunk of results from the worker thread and update the progress, hiding it once all are shown"""
+
+        # The frame may have been closed, or the next subject started, while results were still arriving
+        if not self or session != self.parent.session:
+            return
+
+        self.parent.results.extend(chunk)
+        self.panel_scroll.refresh()
+
+        if done < total:
+            self.gauge.SetRange(total)
+            self.gauge.SetValue(done)
+        else:
+            self.gauge.Hide()
+            self.Layout()
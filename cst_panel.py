@@ -2,102 +2,153 @@
 """This module defines custom panels - any panels that are defined as a separate class for ease or proper function"""
 
 import wx
-import wx.lib.scrolledpanel as scrolled
-from wx.adv import HyperlinkCtrl as hyperlink
 
 import config
+import gbl_colors
+import perf_trace
 
 
-class ScrolledResultsPanel(scrolled.ScrolledPanel):
-    """This scrolled panel contains the summary information populated from the quiz
+class ScrolledResultsPanel(wx.VScrolledWindow):
+    """This virtual scrolled window contains the summary information populated from the quiz
+
+            Only the rows in view are drawn, and link cells are hit-tested on click rather than each being backed by
+            a native hyperlink control, so the summary stays smooth with many thousands of results. Row 0 is the header.
 
             Class Variables:
                 interspace (int): Vertical spacing between rows in results
+                colspace (int): Horizontal spacing between columns in results
 
             Args:
                 parent (ptr): Reference to the wx.object this panel belongs to
 
             Attributes:
                 parent (ptr): Reference to the wx.object this panel belongs to
+                columns (list: Column): Header, result field and precompiled link, if shown, of each column
+                col_widths (list: int): Width in pixels of the widest cell of each column
+                row_height (int): Height in pixels of each row, including spacing
+                font_link (wx.Font): Font used to draw link cells
     """
 
     interspace = 5
+    colspace = 15
 
     def __init__(self, parent):
         """Constructor"""
-        super().__init__(parent, style=wx.BORDER_SIMPLE)
+        super().__init__(parent, style=wx.BORDER_SIMPLE | wx.VSCROLL)
 
         self.parent = parent
 
-        # Create sizers
-        sizer_cols = wx.BoxSizer(wx.HORIZONTAL)
-        self.sizer_affinity = wx.BoxSizer(wx.VERTICAL)
-        self.sizer_code_1 = wx.BoxSizer(wx.VERTICAL)
-        self.sizer_code_2 = wx.BoxSizer(wx.VERTICAL)
-        self.sizer_title_1 = wx.BoxSizer(wx.VERTICAL)
-        self.sizer_title_2 = wx.BoxSizer(wx.VERTICAL)
-
-        # Add headers to sizers
-        self.sizer_affinity.Add(wx.StaticText(self, size=(-1, -1), label="Affinity"), flag=wx.ALL | wx.EXPAND)
-        self.sizer_code_1.Add(wx.StaticText(self, size=(-1, -1), label=config.summary_col_1), flag=wx.ALL | wx.EXPAND)
-        self.sizer_code_2.Add(wx.StaticText(self, size=(-1, -1), label=config.summary_col_2), flag=wx.ALL | wx.EXPAND)
-        self.sizer_title_1.Add(wx.StaticText(self, size=(-1, -1), label=config.summary_col_3), flag=wx.ALL | wx.EXPAND)
-        self.sizer_title_2.Add(wx.StaticText(self, size=(-1, -1), label=config.summary_col_4), flag=wx.ALL | wx.EXPAND)
-        self.sizer_affinity.AddSpacer(ScrolledResultsPanel.interspace)
-        self.sizer_code_1.AddSpacer(ScrolledResultsPanel.interspace)
-        self.sizer_title_1.AddSpacer(ScrolledResultsPanel.interspace)
-        self.sizer_code_2.AddSpacer(ScrolledResultsPanel.interspace)
-        self.sizer_title_2.AddSpacer(ScrolledResultsPanel.interspace)
-
-        # Nest sizers
-        sizer_cols.Add(self.sizer_affinity, flag=wx.ALL | wx.EXPAND)
-        sizer_cols.AddSpacer(15)
-        sizer_cols.Add(self.sizer_code_1, flag=wx.ALL | wx.EXPAND)
-        sizer_cols.AddSpacer(15)
-        sizer_cols.Add(self.sizer_code_2, flag=wx.ALL | wx.EXPAND)
-        sizer_cols.AddSpacer(15)
-        sizer_cols.Add(self.sizer_title_1, flag=wx.ALL | wx.EXPAND)
-        sizer_cols.AddSpacer(15)
-        sizer_cols.Add(self.sizer_title_2, flag=wx.ALL | wx.EXPAND)
-
-        # Set main sizer
-        self.SetSizer(sizer_cols)
-
-        # Setup the scrolling style and function, wanting only vertical scroll to be available
-        self.SetupScrolling()
+        # Column definitions, in display order
+        self.columns = [config.Column("Affinity", 4, None)] + list(config.settings.columns)
+
+        # Measure the header, noting how many results have been measured so far
+        self._extents = {}
+        self._measured = 0
+        self.col_widths = [0] * len(self.columns)
+        self.row_height = self.GetCharHeight() + ScrolledResultsPanel.interspace
+        self.font_link = self.GetFont().Underlined()
+        self.measure_row([column.header for column in self.columns])
+
+        # Draw and hit-test rows ourselves
+        self.SetBackgroundStyle(wx.BG_STYLE_PAINT)
+        self.Bind(wx.EVT_PAINT, self.on_paint)
+        self.Bind(wx.EVT_LEFT_UP, self.on_click)
+        self.Bind(wx.EVT_MOTION, self.on_motion)
+
+        # Only vertical scroll is to be available
         self.ShowScrollbars(wx.SHOW_SB_NEVER, wx.SHOW_SB_ALWAYS)
-        self.SetWindowStyle(wx.VSCROLL)
+        self.SetRowCount(1)
 
-        self.Layout()
+    def OnGetRowHeight(self, row):
+        """Every row shares the same height"""
+        return self.row_height
 
+    @perf_trace.span('ScrolledResultsPanel.refresh')
     def refresh(self):
-        """Populate results into the panel and update the layout"""
-        for result in self.parent.parent.results:
-            self.sizer_affinity.Add(wx.StaticText(self, label=result[4]))
-            self.sizer_affinity.AddSpacer(ScrolledResultsPanel.interspace-1)
-            self.sizer_code_1.Add(self.text_or_hyper(result[0],
-                                                     config.link_1.format(result[config.link_var_1]),
-                                                     config.link_vis_1))
-            self.sizer_code_1.AddSpacer(ScrolledResultsPanel.interspace)
-            self.sizer_code_2.Add(self.text_or_hyper(result[2],
-                                                     config.link_2.format(result[config.link_var_2]),
-                                                     config.link_vis_2))
-            self.sizer_code_2.AddSpacer(ScrolledResultsPanel.interspace)
-            self.sizer_title_1.Add(self.text_or_hyper(result[1],
-                                                      config.link_3.format(result[config.link_var_3]),
-                                                      config.link_vis_3))
-            self.sizer_title_1.AddSpacer(ScrolledResultsPanel.interspace)
-            self.sizer_title_2.Add(self.text_or_hyper(result[3],
-                                                      config.link_4.format(result[config.link_var_4]),
-                                                      config.link_vis_4))
-            self.sizer_title_2.AddSpacer(ScrolledResultsPanel.interspace)
-
-            self.Layout()
-            self.parent.Layout()
-
-    def text_or_hyper(self, text, hyplin=None, toggle=True):
-        """Returns a text or hyperlink object, dependent on optional provided hyperlink and toggle variables"""
-        if hyplin and toggle:
-            return hyperlink(self, label=text, url=hyplin)
+        """Measure any results not yet shown, then update the row count and redraw"""
+        results = self.parent.parent.results
+        for result in results[self._measured:]:
+            self.measure_row([str(result[column.field]) for column in self.columns])
+        self._measured = len(results)
+
+        self.SetRowCount(len(results) + 1)
+        self.Refresh()
+
+    def clear(self):
+        """Forget every result shown, leaving only the header"""
+        self._measured = 0
+        self.col_widths = [0] * len(self.columns)
+        self.measure_row([column.header for column in self.columns])
+
+        self.SetRowCount(1)
+        self.ScrollToRow(0)
+        self.Refresh()
+
+    def measure_row(self, texts):
+        """Widen the columns to fit a row of cell texts"""
+        for i, text in enumerate(texts):
+            self.col_widths[i] = max(self.col_widths[i], self.text_width(text))
+
+    def text_width(self, text):
+        """Return the drawn width of a text, measuring each distinct text only once"""
+        if text not in self._extents:
+            self._extents[text] = self.GetTextExtent(text)[0]
+
+        return self._extents[text]
+
+    def row_cells(self, row):
+        """Return the (text, link or None) of each cell of a row"""
+        if row == 0:
+            return [(column.header, None) for column in self.columns]
+
+        result = self.parent.parent.results[row - 1]
+        return [(str(result[column.field]), column.link(result) if column.link else None) for column in self.columns]
+
+    def on_paint(self, event):
+        """Draw only the rows currently in view"""
+        dc = wx.AutoBufferedPaintDC(self)
+        dc.SetBackground(wx.Brush(self.GetBackgroundColour()))
+        dc.Clear()
+
+        y = 0
+        for row in range(self.GetVisibleRowsBegin(), self.GetVisibleRowsEnd()):
+            x = 0
+            for i, (text, link) in enumerate(self.row_cells(row)):
+                if link:
+                    dc.SetFont(self.font_link)
+                    dc.SetTextForeground(gbl_colors.link)
+                else:
+                    dc.SetFont(self.GetFont())
+                    dc.SetTextForeground(self.GetForegroundColour())
+                dc.DrawText(text, x, y)
+                x += self.col_widths[i] + ScrolledResultsPanel.colspace
+            y += self.row_height
+
+    def hit_link(self, position):
+        """Return the link under a position in the window, or None if there is no link there"""
+        row = self.VirtualHitTest(position.y)
+        if row == wx.NOT_FOUND or row == 0:
+            return None
+
+        x = 0
+        for i, (text, link) in enumerate(self.row_cells(row)):
+            if x <= position.x < x + self.text_width(text):
+                return link
+            x += self.col_widths[i] + ScrolledResultsPanel.colspace
+
+        return None
+
+    def on_click(self, event):
+        """Open the clicked link, if any, in the default browser"""
+        link = self.hit_link(event.GetPosition())
+        if link:
+            wx.LaunchDefaultBrowser(link)
+        event.Skip()
+
+    def on_motion(self, event):
+        """Show a hand cursor while hovering over a link"""
+        if self.hit_link(event.GetPosition()):
+            self.SetCursor(wx.Cursor(wx.CURSOR_HAND))
         else:
-            return wx.StaticText(self, label=text)
+            self.SetCursor(wx.NullCursor)
+        event.Skip()
@@ -2,9 +2,8 @@
 """This module contains a custom widget that is essentially the default radio buttons, but with needed functionality."""
 
 import wx
-import os
 
-from cst_frame import app_root
+import gbl_assets
 
 
 class QuizRadioBox(wx.Control):
@@ -33,16 +32,14 @@ class QuizRadioBox(wx.Control):
         self.sizer_padding = wx.BoxSizer(wx.VERTICAL)
         self.sizer_rbox = wx.BoxSizer(wx.HORIZONTAL)
 
-        # Question text and selection arrow objects
+        # Question text and selection arrow objects, the arrow always holding its place so selecting never relayouts
         self.question_text = wx.StaticText(self, size=(-1, -1), label="NULL")
-        self.select_arrow = wx.StaticBitmap(self, bitmap=wx.Bitmap(wx.Image(os.path.join(app_root,
-                                                                                         'img',
-                                                                                         'r_arr.png'))))
+        self.select_arrow = wx.StaticBitmap(self, bitmap=gbl_assets.get_blank_bitmap('r_arr.png'))
+        self._selected = False
 
-        # Add question and arrow to sizers, hide arrow
+        # Add question and arrow to sizers
         self.sizer_main.Add(self.question_text, border=15, flag=wx.ALL | wx.ALIGN_CENTER_VERTICAL)
         self.sizer_rbox.Add(self.select_arrow, flag=wx.ALL | wx.ALIGN_CENTER_VERTICAL)
-        self.select_arrow.Hide()
 
         # Add radio buttons
         self._items = []
@@ -95,7 +92,10 @@ class QuizRadioBox(wx.Control):
         self._selection = s
 
     def selected_question(self, query):
-        if query:
-            self.select_arrow.Show()
-        else:
-            self.select_arrow.Hide()
+        """Show or blank the selection arrow in place. The caller refreshes the row"""
+        if query != self._selected:
+            self._selected = query
+            if query:
+                self.select_arrow.SetBitmap(gbl_assets.get_bitmap('r_arr.png'))
+            else:
+                self.select_arrow.SetBitmap(gbl_assets.get_blank_bitmap('r_arr.png'))
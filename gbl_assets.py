@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""This module contains the global asset registry, which decodes each image once and hands out shared copies"""
+
+import os
+import threading
+import wx
+
+from gbl_env import app_root
+
+# Decoded images and the bitmaps made from them, keyed by file name within img/
+images = {}
+bitmaps = {}
+
+# Number of requests answered from the registry and number of decodes, keyed by file name
+hits = {}
+misses = {}
+
+_lock = threading.Lock()
+
+
+def path(name):
+    """Return the full path of an asset"""
+    return os.path.join(app_root, 'img', name)
+
+
+def get_image(name):
+    """Return the shared decoded image of an asset, decoding it on first use. Safe from any thread, must not be modified"""
+    with _lock:
+        if name in images:
+            hits[name] = hits.get(name, 0) + 1
+        else:
+            _decode(name)
+
+        return images[name]
+
+
+def get_bitmap(name):
+    """Return the shared bitmap of an asset, decoding it on first use. Main thread only"""
+    if name in bitmaps:
+        with _lock:
+            hits[name] = hits.get(name, 0) + 1
+    else:
+        bitmaps[name] = wx.Bitmap(get_image(name))
+
+    return bitmaps[name]
+
+
+def get_blank_bitmap(name):
+    """Return a transparent bitmap the size of an asset, to hold its place while it is not shown. Main thread only"""
+    key = 'blank:' + name
+    if key not in bitmaps:
+        image = get_image(name)
+        blank = wx.Image(image.GetWidth(), image.GetHeight())
+        blank.InitAlpha()
+        blank.SetAlpha(bytes(image.GetWidth() * image.GetHeight()))
+        bitmaps[key] = wx.Bitmap(blank)
+
+    return bitmaps[key]
+
+
+def preload(names):
+    """Decode a list of assets on a background thread so they are ready when first requested"""
+    def decode():
+        for name in names:
+            with _lock:
+                if name not in images:
+                    _decode(name)
+
+    threading.Thread(target=decode, daemon=True).start()
+
+
+def _decode(name):
+    misses[name] = misses.get(name, 0) + 1
+    images[name] = wx.Image(path(name))
+
+
+def report():
+    """Print the hit and decode counts of every asset requested so far"""
+    with _lock:
+        for name in sorted(set(hits) | set(misses)):
+            print("{}: {} hits, {} decodes".format(name, hits.get(name, 0), misses.get(name, 0)))
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
 """This module contains global variables for various colors throughout the application"""
 
-background = (188, 203, 221)
\ No newline at end of file
+background = (188, 203, 221)
+link = (0, 0, 255)
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""This module contains global variables describing the environment the application runs in"""
+
+import getpass
+import hashlib
+import os
+import stat
+import sys
+import tempfile
+
+is_demo = True
+
+# Handle whether we are frozen
+if getattr(sys, 'frozen', False):
+    app_root = sys._MEIPASS
+else:
+    app_root = os.path.dirname(os.path.abspath(__file__))
+
+# Commands the resident process accepts, the line a cold start prints once its cover is shown, the seconds the launcher
+# waits for the resident process to show a cover before starting cold instead, and the seconds either side of a
+# connection waits for the other's part of the handshake
+resident_commands = (b'open', b'measure', b'quit')
+resident_marker = 'cover shown'
+resident_timeout = 10
+handshake_timeout = 2
+
+
+def source_matches(path, sha256, mtime_ns, size):
+    """Whether a source file still holds the content something was built from, given its SHA-256, mtime and size then
+
+            A matching modification time and size is trusted outright; otherwise the file is hashed and compared.
+    """
+    info = os.stat(path)
+    if (info.st_mtime_ns, info.st_size) == (mtime_ns, size):
+        return True
+
+    with open(path, 'rb') as stream:
+        return hashlib.sha256(stream.read()).hexdigest() == sha256
+
+
+def resident_paths():
+    """Return the (address, key file) of the resident process, creating the user-private directory the key lives in
+
+            Raises OSError if the directory already exists but is not private to this user.
+    """
+    if sys.platform == 'win32':
+        directory = os.path.join(os.environ.get('LOCALAPPDATA') or tempfile.gettempdir(), 'psynt')
+        os.makedirs(directory, exist_ok=True)
+        return r'\\.\pipe\psynt-resident-{}'.format(getpass.getuser()), os.path.join(directory, 'resident.key')
+
+    directory = os.path.join(os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir(), 'psynt-{}'.format(os.getuid()))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise OSError("{} is not a directory private to this user".format(directory))
+
+    return os.path.join(directory, 'resident.sock'), os.path.join(directory, 'resident.key')
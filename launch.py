@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""This module is the thin launcher - it asks the resident process to open a quiz window, or starts one cold
+
+Only the standard library is imported here, so the launcher itself starts almost instantly.
+"""
+
+import hmac
+import os
+import subprocess
+import sys
+from multiprocessing.connection import Client
+
+from gbl_env import handshake_timeout, resident_paths, resident_timeout
+
+
+def request_window(command=b'open', timeout=resident_timeout):
+    """Send the resident process one of its commands, by default to open a quiz window, returning its reply
+
+            The resident process's challenge is answered with an HMAC under the key it wrote to the user's private
+            directory, so only this user's processes can command it. Raises OSError if the resident process is absent,
+            or TimeoutError if it does not answer, or show a cover, within timeout seconds.
+    """
+    address, key_file = resident_paths()
+    with open(key_file, 'rb') as stream:
+        key = stream.read()
+
+    connection = Client(address)
+    try:
+        if not connection.poll(handshake_timeout):
+            raise TimeoutError("The resident process sent no challenge within {} s".format(handshake_timeout))
+        challenge = connection.recv_bytes(64)
+        connection.send_bytes(hmac.new(key, challenge, 'sha256').digest() + command)
+
+        if not connection.poll(timeout):
+            raise TimeoutError("The resident process did not show a cover within {} s".format(timeout))
+        return connection.recv_bytes(64).decode('utf-8')
+    finally:
+        connection.close()
+
+
+def main():
+    """Open a quiz window through the resident process, starting cold if it is not running or does not respond"""
+    try:
+        request_window()
+    except (OSError, EOFError) as error:
+        if isinstance(error, TimeoutError):
+            print("{}, starting cold".format(error), file=sys.stderr)
+
+        # The frozen launcher is built without wx, so it hands off to the full application's executable instead
+        if getattr(sys, 'frozen', False):
+            subprocess.Popen([os.path.join(os.path.dirname(sys.executable), 'cst_frame')] + sys.argv[1:])
+            return
+
+        import cst_frame
+        cst_frame.main()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""This module is the tracing surface - timed spans kept in a ring buffer and written out as a Chrome trace on exit
+
+Tracing is off unless the PSYNT_TRACE environment variable is set, in which case it names the trace file to write
+('1' writes psynt_trace_<pid>.json in the working directory). PSYNT_TRACE_SIZE sets how many spans the ring buffer
+keeps, the oldest being dropped first. Open the file in chrome://tracing or https://ui.perfetto.dev.
+
+While tracing is off, span and input_span hand back the function they decorate untouched, so there is no overhead.
+"""
+
+import atexit
+import collections
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+# Where to write the trace, or None while tracing is off
+_setting = os.environ.get('PSYNT_TRACE')
+enabled = bool(_setting)
+trace_path = None
+if enabled:
+    trace_path = 'psynt_trace_{}.json'.format(os.getpid()) if _setting == '1' else _setting
+
+# Recorded spans as (name, category, start ns, duration ns or None for an instant, thread id, args), the newest last
+capacity = int(os.environ.get('PSYNT_TRACE_SIZE', 100000))
+spans = collections.deque(maxlen=capacity)
+
+# Input handling latency histograms, keyed by event, each a count per power-of-two bucket of microseconds
+latency_buckets = 21
+latencies = {}
+
+_origin = time.perf_counter_ns()
+_thread_names = {}
+_lock = threading.Lock()
+
+
+def record(name, category, start, duration, args=None):
+    """Add a finished span to the ring buffer"""
+    thread = threading.get_ident()
+    if thread not in _thread_names:
+        _thread_names[thread] = threading.current_thread().name
+    spans.append((name, category, start, duration, thread, args))
+
+
+def instant(name, **args):
+    """Record a point-in-time event, with any arguments worth keeping, if tracing is on"""
+    if enabled:
+        record(name, 'mark', time.perf_counter_ns(), None, args)
+
+
+def span(name, category='app'):
+    """Decorate a function to record a span around every call, if tracing is on"""
+    def decorate(function):
+        if not enabled:
+            return function
+
+        @functools.wraps(function)
+        def traced(*args, **kwargs):
+            start = time.perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record(name, category, start, time.perf_counter_ns() - start)
+
+        return traced
+
+    return decorate
+
+
+def input_span(name):
+    """Decorate an input event handler to record a span around every call and its latency, keyed by key code"""
+    def decorate(function):
+        if not enabled:
+            return function
+
+        @functools.wraps(function)
+        def traced(self, event, *args, **kwargs):
+            start = time.perf_counter_ns()
+            try:
+                return function(self, event, *args, **kwargs)
+            finally:
+                duration = time.perf_counter_ns() - start
+                key = event.GetKeyCode() if hasattr(event, 'GetKeyCode') else None
+                record(name, 'input', start, duration, {'key': key})
+                add_latency('{} key {}'.format(name, key), duration)
+
+        return traced
+
+    return decorate
+
+
+def add_latency(event, duration):
+    """Count an input event's handling time in its latency histogram"""
+    bucket = min(max(duration // 1000, 1).bit_length() - 1, latency_buckets - 1)
+
+    with _lock:
+        if event not in latencies:
+            latencies[event] = [0] * latency_buckets
+        latencies[event][bucket] += 1
+
+
+def bucket_label(bucket):
+    """Return the range of microseconds counted in a latency histogram bucket"""
+    if bucket == latency_buckets - 1:
+        return '>={}us'.format(1 << bucket)
+
+    return '{}-{}us'.format(1 << bucket if bucket else 0, (1 << (bucket + 1)) - 1)
+
+
+def chrome_trace():
+    """Return the recorded spans and latency histograms as a Chrome trace dictionary"""
+    pid = os.getpid()
+    events = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': thread, 'args': {'name': name}}
+              for thread, name in list(_thread_names.items())]
+
+    for name, category, start, duration, thread, args in list(spans):
+        event = {'name': name, 'cat': category, 'pid': pid, 'tid': thread, 'ts': (start - _origin) / 1000}
+        if duration is None:
+            event.update(ph='i', s='t')
+        else:
+            event.update(ph='X', dur=duration / 1000)
+        if args:
+            event['args'] = args
+        events.append(event)
+
+    histograms = {event: {bucket_label(i): count for i, count in enumerate(counts) if count}
+                  for event, counts in sorted(latencies.items())}
+
+    return {'traceEvents': events, 'displayTimeUnit': 'ms',
+            'otherData': {'input_latency': histograms, 'buffer_full': len(spans) == spans.maxlen}}
+
+
+def dump(path=None):
+    """Write the trace to a file, by default the one named by PSYNT_TRACE, and summarise input latency to stderr"""
+    path = path or trace_path
+    with open(path, 'w') as stream:
+        json.dump(chrome_trace(), stream)
+
+    print("Wrote {} spans to {}".format(len(spans), path), file=sys.stderr)
+    for event, counts in sorted(latencies.items()):
+        print("{}: {}".format(event, ", ".join("{} x{}".format(bucket_label(i), count)
+                                              for i, count in enumerate(counts) if count)), file=sys.stderr)
+
+
+if enabled:
+    atexit.register(dump)
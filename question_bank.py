@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""This module contains the question bank - questions held compactly and handed out a page at a time"""
+
+import random
+from array import array
+
+import scoring
+
+
+class QuestionBank:
+    """Question bank handing out pages of questions through a cursor over a shuffled order
+
+            Question texts are held as one UTF-8 blob with an array of offsets, and types in a byte array, so a bank
+            of a hundred thousand questions stays small. Handing out a page only moves the cursor.
+
+            Args:
+                blob (bytes): Every question text, UTF-8 encoded and concatenated, or a memoryview of a bundle
+                offsets (array: int): Start of each question text within the blob, followed by the end of the last
+                types (array: int): Question type of each question
+
+            Attributes:
+                order (array: int): Order in which questions are handed out, as indices into the bank
+                cursor (int): Position within order of the next question to hand out
+    """
+
+    def __init__(self, blob, offsets, types):
+        """Constructor"""
+        self._blob = blob
+        self._offsets = offsets
+        self._types = types
+
+        self.order = array('I', range(len(types)))
+        self.cursor = 0
+
+    def __len__(self):
+        """Number of questions not yet handed out"""
+        return len(self.order) - self.cursor
+
+    @classmethod
+    def from_questions(cls, questions):
+        """Build a bank from a list of [question, type] entries"""
+        encoded = [question.encode('utf-8') for question, _ in questions]
+
+        offsets = array('I', [0])
+        for text in encoded:
+            offsets.append(offsets[-1] + len(text))
+
+        return cls(b"".join(encoded), offsets, array('B', [q_type for _, q_type in questions]))
+
+    @classmethod
+    def load(cls, path):
+        """Load every question of a questions file, each line written as 'type :: question'"""
+        with open(path, 'r') as file:
+            return cls.from_questions([parse_line(line) for line in file if line.strip()])
+
+    @classmethod
+    def sample(cls, path, per_type, rng=random):
+        """Stream a very large questions file, keeping a uniform random sample of up to per_type questions of each type
+
+                Uses reservoir sampling for each type, so memory is bounded by the sample rather than the file.
+        """
+        reservoirs = [[] for _ in range(scoring.n_categories)]
+        seen = [0] * scoring.n_categories
+
+        with open(path, 'r') as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                question, q_type = parse_line(line)
+                seen[q_type] += 1
+
+                if len(reservoirs[q_type]) < per_type:
+                    reservoirs[q_type].append([question, q_type])
+                else:
+                    slot = rng.randrange(seen[q_type])
+                    if slot < per_type:
+                        reservoirs[q_type][slot] = [question, q_type]
+
+        return cls.from_questions([entry for reservoir in reservoirs for entry in reservoir])
+
+    def clone(self):
+        """Return a new bank over the same questions, sharing their storage, with every question yet to hand out"""
+        return QuestionBank(self._blob, self._offsets, self._types)
+
+    @property
+    def blob(self):
+        """Every question text, UTF-8 encoded and concatenated in file order"""
+        return self._blob
+
+    @property
+    def offsets(self):
+        """Start of each question text within the blob, followed by the end of the last"""
+        return self._offsets
+
+    @property
+    def types(self):
+        """Question type of every question in the bank, in file order"""
+        return self._types
+
+    def question(self, index):
+        """Return the [question, type] entry of a question in the bank"""
+        return [str(self._blob[self._offsets[index]:self._offsets[index + 1]], 'utf-8'), self._types[index]]
+
+    def shuffle(self, rng=random):
+        """Shuffle the questions not yet handed out"""
+        remaining = self.order[self.cursor:]
+        rng.shuffle(remaining)
+        self.order[self.cursor:] = remaining
+
+    def shuffled_order(self, rng=random):
+        """Return a new order of every question in the bank, shuffled, without touching the current order"""
+        order = array('I', range(len(self._types)))
+        rng.shuffle(order)
+
+        return order
+
+    def reset(self, order=None, rng=random):
+        """Return every question to the bank, either in a prepared order from shuffled_order or shuffled afresh"""
+        self.cursor = 0
+        if order is None:
+            self.shuffle(rng)
+        else:
+            self.order = order
+
+    def remaining_by_type(self):
+        """Return the number of questions of each type not yet handed out"""
+        counts = [0] * scoring.n_categories
+        for index in self.order[self.cursor:]:
+            counts[self._types[index]] += 1
+
+        return counts
+
+    def bring_forward(self, q_types, quantity):
+        """Move up to quantity questions of the given types to the front of those not yet handed out"""
+        q_types = set(q_types)
+        front = self.cursor
+
+        for position in range(self.cursor, len(self.order)):
+            if front - self.cursor >= quantity:
+                break
+            if self._types[self.order[position]] in q_types:
+                self.order[front], self.order[position] = self.order[position], self.order[front]
+                front += 1
+
+    def next_page(self, quantity, prefer=None):
+        """Hand out the next page of up to quantity questions, as a list of [question, type] entries
+
+                Questions of the types listed in prefer, if given, are handed out ahead of the others.
+        """
+        if prefer:
+            self.bring_forward(prefer, quantity)
+
+        page = self.order[self.cursor:self.cursor + quantity]
+        self.cursor += len(page)
+
+        return [self.question(index) for index in page]
+
+
+def parse_line(line):
+    """Parse a line of a questions file into a [question, type] entry"""
+    _type, _question = line.strip().split(" :: ")
+
+    return [_question, int(_type)]
@@ -0,0 +1,378 @@
+# -*- coding: utf-8 -*-
+"""This module is the headless quiz server - it serves the questionnaire and scoring over HTTP/JSON with asyncio
+
+The question bank, convert key and config are loaded once and shared read-only between every session. A session only
+holds its own question order (two integers), a cursor and its scores. Endpoints:
+
+    GET    /questionnaire           Labels and instructions needed to render the quiz
+    POST   /sessions                Start a session, returning its id
+    GET    /sessions/<id>/page      Current page of questions
+    POST   /sessions/<id>/answers   Answer every question of the current page: {"answers": {"<question>": selection}}
+    GET    /sessions/<id>/results   Scores, ranking and results once every page has been answered
+    DELETE /sessions/<id>           End a session
+
+Request bodies over 64 KiB are refused with 413, and new sessions with 503 while --max-sessions are live. A client
+has 30 s to send each request, and connections beyond 1000 are refused with 503.
+
+Run with --load-test to drive simulated sessions through a local server on one core and report sessions per second.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import secrets
+import time
+
+import config
+import content_bundle
+import convert_key
+import question_bank
+import scoring
+from gbl_env import app_root
+
+
+class QuizSession:
+    """State of a single subject's quiz
+
+            Questions are handed out in the order (step * position + offset) mod bank size, which visits every question
+            exactly once when step is coprime with the bank size, so no per-session copy of the bank is needed.
+
+            Attributes:
+                step (int): Multiplier of the session's question order, coprime with the bank size
+                offset (int): Offset of the session's question order
+                cursor (int): Position of the first question of the current page
+                scoring (list: int): Cumulative score of each category
+                last_seen (float): Time of the session's last request, for expiry
+    """
+
+    __slots__ = ('step', 'offset', 'cursor', 'scoring', 'last_seen')
+
+    def __init__(self, size, rng=random):
+        """Constructor"""
+        self.step = 1
+        if size > 2:
+            self.step = rng.randrange(1, size)
+            while math.gcd(self.step, size) != 1:
+                self.step = rng.randrange(1, size)
+        self.offset = rng.randrange(size) if size else 0
+        self.cursor = 0
+        self.scoring = [0] * scoring.n_categories
+        self.last_seen = time.monotonic()
+
+    def page(self, size, quantity):
+        """Return the bank indices of the questions on the current page"""
+        return [(self.step * position + self.offset) % size
+                for position in range(self.cursor, min(self.cursor + quantity, size))]
+
+
+class QuizServer:
+    """Asyncio HTTP server running quiz sessions against shared, read-only content
+
+            Args:
+                bank (QuestionBank): Question bank, used only for its questions and never handed out from
+                key (ConvertKey): Convert key the results are looked up in
+                page_size (int): Number of questions per page
+                session_ttl (float): Seconds of inactivity after which a session is dropped
+                max_sessions (int): Number of live sessions beyond which new sessions are refused
+
+            Attributes:
+                sessions (dict): Live sessions, keyed by session id
+    """
+
+    def __init__(self, bank, key, page_size=10, session_ttl=1800, max_sessions=10000):
+        """Constructor"""
+        self.bank = bank
+        self.key = key
+        self.page_size = page_size
+        self.session_ttl = session_ttl
+        self.max_sessions = max_sessions
+        self.sessions = {}
+
+        self._connections = 0
+        self._size = len(bank.types)
+        settings = config.settings
+        self._questionnaire = json.dumps({'staticbox_label': settings.staticbox_label,
+                                          'rbox_labels': settings.rbox_labels,
+                                          'instructions': settings.instructions,
+                                          'summary_text': settings.summary_text,
+                                          'summary_cols': [column.header for column in settings.columns],
+                                          'questions': self._size,
+                                          'page_size': page_size}).encode('utf-8')
+
+    async def serve(self, host='127.0.0.1', port=8080):
+        """Start listening, returning the asyncio server"""
+        asyncio.get_running_loop().create_task(self.expire_sessions())
+
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    async def expire_sessions(self):
+        """Drop sessions that have been idle for longer than the session lifetime"""
+        while True:
+            await asyncio.sleep(min(60, self.session_ttl))
+            cutoff = time.monotonic() - self.session_ttl
+            for session_id in [i for i, session in self.sessions.items() if session.last_seen < cutoff]:
+                del self.sessions[session_id]
+
+    async def handle_connection(self, reader, writer):
+        """Serve HTTP/1.1 requests on a connection until the client closes it or leaves it idle too long"""
+        self._connections += 1
+        try:
+            if self._connections > max_connections:
+                payload = encode({'error': "Too many connections, try again later"})
+                writer.write(b'HTTP/1.1 503 %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n'
+                             % (http_reasons[503], len(payload)) + payload)
+                await writer.drain()
+                return
+
+            while True:
+                # Each request must arrive in full within the timeout, so slow or silent clients cannot hold on
+                request = await asyncio.wait_for(read_request(reader), request_timeout)
+                if request is None:
+                    break
+                method, path, headers, body = request
+
+                # Refuse anything too large to be a genuine request without reading it, and drop the connection
+                if len(headers) > max_headers:
+                    status, payload = 431, encode({'error': "Too many headers"})
+                elif body is None:
+                    status, payload = 413, encode({'error': "Request bodies are limited to {} bytes".format(max_body)})
+                else:
+                    status, payload = self.route(method, path, body)
+
+                writer.write(b'HTTP/1.1 %d %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n'
+                             % (status, http_reasons[status], len(payload)) + payload)
+                await writer.drain()
+
+                if status in (413, 431) or headers.get('connection', '').lower() == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError):
+            pass
+        finally:
+            self._connections -= 1
+            writer.close()
+
+    def route(self, method, path, body):
+        """Dispatch a request, returning (status, JSON payload bytes)"""
+        parts = path.strip('/').split('/')
+
+        if method == 'GET' and parts == ['questionnaire']:
+            return 200, self._questionnaire
+
+        if method == 'POST' and parts == ['sessions']:
+            if len(self.sessions) >= self.max_sessions:
+                return 503, encode({'error': "Too many sessions in progress, try again later"})
+            session_id = secrets.token_urlsafe(12)
+            self.sessions[session_id] = QuizSession(self._size)
+            return 201, encode({'session': session_id})
+
+        if len(parts) < 2 or parts[0] != 'sessions' or parts[1] not in self.sessions:
+            return 404, encode({'error': "Unknown session or path"})
+        session_id, session = parts[1], self.sessions[parts[1]]
+        session.last_seen = time.monotonic()
+
+        if method == 'DELETE' and len(parts) == 2:
+            del self.sessions[session_id]
+            return 200, encode({})
+
+        if method == 'GET' and parts[2:] == ['page']:
+            return 200, encode(self.page(session))
+
+        if method == 'POST' and parts[2:] == ['answers']:
+            try:
+                answers = json.loads(body)['answers']
+            except (ValueError, KeyError, TypeError):
+                return 400, encode({'error': "Expected a JSON object of answers"})
+            return self.answer(session, answers)
+
+        if method == 'GET' and parts[2:] == ['results']:
+            if session.cursor < self._size:
+                return 409, encode({'error': "Questions remain unanswered"})
+            return 200, encode(self.results(session))
+
+        return 404, encode({'error': "Unknown session or path"})
+
+    def page(self, session):
+        """Return the current page of a session as a JSON-ready dictionary"""
+        return {'questions': [{'id': index, 'text': self.bank.question(index)[0]}
+                              for index in session.page(self._size, self.page_size)],
+                'remaining': self._size - session.cursor}
+
+    def answer(self, session, answers):
+        """Commit a full page of answers to a session's scores, returning (status, JSON payload bytes)"""
+        page = session.page(self._size, self.page_size)
+        maximum = len(config.settings.rbox_labels)
+
+        try:
+            selections = {int(q): int(value) for q, value in answers.items()}
+        except (ValueError, TypeError, AttributeError):
+            return 400, encode({'error': "Answers must map question ids to selections"})
+
+        # Mirror the quiz pane: every question on the page needs an answer before moving on
+        if not page or sorted(selections) != sorted(page) or not all(1 <= s <= maximum for s in selections.values()):
+            return 409, encode({'error': "Every question on the current page needs a selection from 1 to {}"
+                                .format(maximum)})
+
+        for index, selection in selections.items():
+            session.scoring[self.bank.types[index]] += selection
+        session.cursor += len(page)
+
+        return 200, encode({'remaining': self._size - session.cursor, 'finished': session.cursor >= self._size})
+
+    def results(self, session):
+        """Return the scores, ranking and results of a finished session as a JSON-ready dictionary"""
+        ranking = scoring.list_max_index(session.scoring, scoring.n_ranks)
+
+        return {'scoring': session.scoring,
+                'ranking': ranking,
+                'results': scoring.result_cache.get(ranking, self.key, config.settings.initials).tolist()}
+
+
+http_reasons = {200: b'OK', 201: b'Created', 400: b'Bad Request', 404: b'Not Found', 409: b'Conflict',
+                413: b'Payload Too Large', 431: b'Request Header Fields Too Large', 503: b'Service Unavailable'}
+
+# Largest request body and number of headers accepted - a page of answers needs a few hundred bytes
+max_body = 65536
+max_headers = 100
+
+# Seconds a client has to send each request in full, idle time before it included, and the open connections allowed
+request_timeout = 30
+max_connections = 1000
+
+
+async def read_request(reader):
+    """Read a request, returning (method, path, headers, body), or None once the client has closed the connection
+
+            Reading stops early at more than max_headers headers, and the body is None if it is larger than max_body.
+    """
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    method, path, _ = request_line.decode('latin-1').split(' ', 2)
+
+    headers = {}
+    while len(headers) <= max_headers:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    length = int(headers.get('content-length', 0))
+    if len(headers) > max_headers or not 0 <= length <= max_body:
+        return method, path, headers, None
+
+    return method, path, headers, await reader.readexactly(length)
+
+
+def encode(payload):
+    """Encode a JSON response payload"""
+    return json.dumps(payload).encode('utf-8')
+
+
+async def request(reader, writer, method, path, payload=None):
+    """Send a keep-alive HTTP request over an open connection and return (status, decoded JSON body)"""
+    body = b'' if payload is None else encode(payload)
+    writer.write(b'%s %s HTTP/1.1\r\nHost: localhost\r\nContent-Length: %d\r\n\r\n'
+                 % (method.encode('ascii'), path.encode('ascii'), len(body)) + body)
+
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        if line.lower().startswith(b'content-length:'):
+            length = int(line.split(b':')[1])
+
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def simulate_subject(host, port, rng):
+    """Run one simulated subject through a whole session over a local connection"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        _, questionnaire = await request(reader, writer, 'GET', '/questionnaire')
+        _, created = await request(reader, writer, 'POST', '/sessions')
+        session = '/sessions/' + created['session']
+
+        while True:
+            _, page = await request(reader, writer, 'GET', session + '/page')
+            answers = {q['id']: rng.randint(1, len(questionnaire['rbox_labels'])) for q in page['questions']}
+            _, answered = await request(reader, writer, 'POST', session + '/answers', {'answers': answers})
+            if answered['finished']:
+                break
+
+        status, _ = await request(reader, writer, 'GET', session + '/results')
+        await request(reader, writer, 'DELETE', session)
+
+        return status == 200
+    finally:
+        writer.close()
+
+
+async def load_test(server, sessions, concurrency, seed=0):
+    """Drive simulated subjects through a local server, printing sessions per second"""
+    listener = await server.serve('127.0.0.1', 0)
+    port = listener.sockets[0].getsockname()[1]
+    rng = random.Random(seed)
+    remaining = [sessions]
+    completed = [0]
+
+    async def client():
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            succeeded = await simulate_subject('127.0.0.1', port, rng)
+            completed[0] += succeeded
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+
+    listener.close()
+    await listener.wait_closed()
+
+    print("{} of {} sessions completed in {:.2f} s with {} concurrent clients: {:.1f} sessions/s"
+          .format(completed[0], sessions, elapsed, concurrency, completed[0] / elapsed))
+
+
+def main(argv=None):
+    """Parse the command line, then serve quizzes or run the load test"""
+    parser = argparse.ArgumentParser(description="Serve the questionnaire over HTTP/JSON")
+    parser.add_argument('--host', default='127.0.0.1', help="Address to listen on")
+    parser.add_argument('--port', type=int, default=8080, help="Port to listen on")
+    parser.add_argument('--page-size', type=int, default=10, help="Number of questions per page")
+    parser.add_argument('--max-sessions', type=int, default=10000,
+                        help="Number of live sessions beyond which new sessions are refused")
+    parser.add_argument('--load-test', type=int, metavar='SESSIONS',
+                        help="Instead of serving, run this many simulated sessions against a local server")
+    parser.add_argument('--concurrency', type=int, default=50, help="Concurrent clients during the load test")
+    args = parser.parse_args(argv)
+
+    config.load_config()
+    bundle = content_bundle.current()
+    if bundle:
+        bank, key = bundle.question_bank(), bundle.convert_key()
+    else:
+        questions_file, convert_key_file, _ = content_bundle.source_files()
+        bank = question_bank.QuestionBank.load(os.path.join(app_root, questions_file))
+        key = convert_key.open_key(os.path.join(app_root, convert_key_file))
+    server = QuizServer(bank, key, args.page_size, max_sessions=args.max_sessions)
+
+    if args.load_test:
+        asyncio.run(load_test(server, args.load_test, args.concurrency))
+        return
+
+    async def serve_forever():
+        listener = await server.serve(args.host, args.port)
+        print("Serving on http://{}:{}".format(args.host, args.port))
+        async with listener:
+            await listener.serve_forever()
+
+    asyncio.run(serve_forever())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""This module is the resident process - it keeps wx and the parsed content loaded and opens quiz windows on request
+
+Start it with 'cst_frame.py --resident'. The thin launcher (launch.py) then asks it over a local socket or named pipe to
+open a window, which appears without paying for interpreter start-up, imports or content parsing again.
+
+Run this module directly to compare cold and warm launch-to-cover latency:
+
+    python resident.py --runs 10
+"""
+
+import argparse
+import hmac
+import os
+import secrets
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing.connection import Listener
+
+import wx
+
+import cst_frame
+import gbl_assets
+import launch
+from gbl_env import app_root, handshake_timeout, is_demo, resident_commands, resident_marker, resident_paths
+
+
+def serve():
+    """Preload everything, then open a quiz window for every request until asked to quit"""
+    app = wx.App()
+    app.SetExitOnFrameDelete(False)
+
+    # Parse content and decode images once, for every window to share
+    cst_frame.MainApp.preload_content()
+    if is_demo:
+        gbl_assets.preload(['r_arr.png', 'cover_demo.jpg'])
+    else:
+        gbl_assets.preload(['r_arr.png', 'cover_production.jpg'])
+
+    # A fresh key every start, readable only by this user, which launchers must prove they hold
+    address, key_file = resident_paths()
+    key = secrets.token_bytes(32)
+    descriptor = os.open(key_file + '.tmp', os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(descriptor, 'wb') as stream:
+        stream.write(key)
+    os.replace(key_file + '.tmp', key_file)
+
+    if not sys.platform == 'win32' and os.path.exists(address):
+        os.remove(address)
+    listener = Listener(address)
+    threading.Thread(target=accept_requests, args=(app, listener, key), daemon=True).start()
+
+    app.MainLoop()
+    listener.close()
+
+
+def accept_requests(app, listener, key):
+    """Accept launcher connections, handling each on a thread of its own so a silent client holds up no other"""
+    while True:
+        try:
+            connection = listener.accept()
+        except OSError:
+            continue
+
+        threading.Thread(target=handle_request, args=(app, connection, key), daemon=True).start()
+
+
+def read_command(connection, key):
+    """Challenge a launcher connection, returning its command once it has proved it holds the key, or else None"""
+    challenge = secrets.token_bytes(32)
+    connection.send_bytes(challenge)
+    if not connection.poll(handshake_timeout):
+        return None
+
+    # Only raw bytes are read, never unpickled, and anything longer than a signed command is refused
+    message = connection.recv_bytes(64)
+    digest, command = message[:32], message[32:]
+    if hmac.compare_digest(digest, hmac.new(key, challenge, 'sha256').digest()) and command in resident_commands:
+        return command
+
+    return None
+
+
+def handle_request(app, connection, key):
+    """Authenticate a launcher connection and hand its command to the main thread, hanging up on anything else"""
+    try:
+        command = read_command(connection, key)
+    except (OSError, EOFError):
+        command = None
+
+    if command is None:
+        connection.close()
+        return
+
+    if command == b'quit':
+        connection.send_bytes(b'quitting')
+        connection.close()
+        wx.CallAfter(app.ExitMainLoop)
+        return
+
+    wx.CallAfter(open_window, connection, command)
+
+
+def open_window(connection, command):
+    """Open a quiz window, replying to the launcher once its cover is shown. A measure command closes it again"""
+    # Hang up on a failure so the launcher starts cold at once rather than waiting out its timeout
+    try:
+        window = cst_frame.open_window()
+    except Exception:
+        connection.close()
+        raise
+
+    def cover_shown():
+        try:
+            connection.send_bytes(resident_marker.encode('utf-8'))
+        finally:
+            connection.close()
+        if command == b'measure':
+            window.Close()
+
+    window.on_cover_shown = cover_shown
+
+
+def app_command(*args):
+    """Return the command line that runs the application, frozen or not"""
+    if getattr(sys, 'frozen', False):
+        return [sys.executable] + list(args)
+
+    return [sys.executable, os.path.join(app_root, 'cst_frame.py')] + list(args)
+
+
+def measure_cold():
+    """Return the seconds from starting a new process to its cover being shown"""
+    start = time.perf_counter()
+    process = subprocess.Popen(app_command('--exit-on-cover'), stdout=subprocess.PIPE, universal_newlines=True)
+
+    for line in process.stdout:
+        if line.strip() == resident_marker:
+            break
+    elapsed = time.perf_counter() - start
+
+    process.wait()
+    return elapsed
+
+
+def measure_warm():
+    """Return the seconds from asking the resident process for a window to its cover being shown"""
+    start = time.perf_counter()
+    launch.request_window(b'measure')
+
+    return time.perf_counter() - start
+
+
+def measure(runs):
+    """Time cold launches, then warm launches through a freshly started resident process, and print a comparison"""
+    cold = [measure_cold() for _ in range(runs)]
+
+    daemon = subprocess.Popen(app_command('--resident'))
+    try:
+        # Wait for the resident process to start listening
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                launch.request_window(b'measure')
+                break
+            except (OSError, EOFError):
+                if time.monotonic() > deadline or daemon.poll() is not None:
+                    raise
+                time.sleep(0.1)
+
+        warm = [measure_warm() for _ in range(runs)]
+        launch.request_window(b'quit')
+    finally:
+        daemon.wait(timeout=30)
+
+    for name, times in (('cold', cold), ('warm', warm)):
+        print("{}: median {:.1f} ms, min {:.1f} ms, max {:.1f} ms over {} launches".format(
+            name, statistics.median(times) * 1000, min(times) * 1000, max(times) * 1000, len(times)))
+    print("warm launches are {:.1f}x faster".format(statistics.median(cold) / statistics.median(warm)))
+
+
+def main(argv=None):
+    """Parse the command line and run the launch measurement"""
+    parser = argparse.ArgumentParser(description="Compare cold and warm launch-to-cover latency")
+    parser.add_argument('--runs', type=int, default=10, help="Number of launches to time for each mode")
+    args = parser.parse_args(argv)
+
+    measure(args.runs)
+
+
+if __name__ == '__main__':
+    main()
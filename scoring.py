@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*-
+"""This module contains the scoring engine - tallying, ranking and result lookup, free of any GUI dependency"""
+
+import functools
+import itertools
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+
+# Number of question types (score categories) and the number of ranks considered when looking up results
+n_categories = 7
+n_ranks = 4
+n_result_ranks = 3
+
+
+def list_max_index(ls, n):
+    """Takes a list of numbers and returns the n max indices from max to min. Ties are returned as tuples at index
+
+    The top n tie groups are collected in a single pass, keeping only the n largest distinct values seen so far.
+    """
+    # An empty list has always produced n empty groups rather than none
+    if len(ls) == 0:
+        return [[] for _ in range(n)]
+
+    values = []
+    groups = []
+
+    for i, j in enumerate(ls):
+        for k, value in enumerate(values):
+            if j == value:
+                groups[k].append(i)
+                break
+            if j > value:
+                values.insert(k, j)
+                groups.insert(k, [i])
+                if len(values) > n:
+                    values.pop()
+                    groups.pop()
+                break
+        else:
+            if len(values) < n:
+                values.append(j)
+                groups.append([i])
+
+    return groups
+
+
+def score_sheet(sheet):
+    """Tally an answer sheet - an iterable of (question type, selection) pairs - into a list of category scores"""
+    scoring = [0] * n_categories
+    for q_type, selection in sheet:
+        scoring[q_type] += selection
+
+    return scoring
+
+
+@functools.lru_cache(maxsize=8)
+def _rank_labels(initials):
+    return [sys.intern("|".join(str(initials[i]) for i in key))
+            for key in itertools.product(range(n_categories), repeat=3)]
+
+
+def rank_labels(initials):
+    """Return the affinity label of every ordered category triple, indexed by convert key slot"""
+    return _rank_labels(tuple(initials))
+
+
+class Result:
+    """Single result, a view onto one row of a result set's columns with the affinity label as its last field
+
+            Args:
+                columns (list): One sequence per result field, shared with the result set
+                row (int): Index of the result's row in the columns
+                label (str): Joined category initials of the slot the result was found in
+
+            Attributes:
+                columns (list): One sequence per result field, shared with the result set
+                row (int): Index of the result's row in the columns
+                label (str): Joined category initials of the slot the result was found in
+    """
+
+    __slots__ = ('columns', 'row', 'label')
+
+    def __init__(self, columns, row, label):
+        """Constructor"""
+        self.columns = columns
+        self.row = row
+        self.label = label
+
+    def __len__(self):
+        return len(self.columns) + 1
+
+    def __getitem__(self, field):
+        # Index like the list of fields it stands in for, the label last
+        if isinstance(field, slice):
+            return self.tolist()[field]
+        if field < 0:
+            field += len(self.columns) + 1
+        if not 0 <= field <= len(self.columns):
+            raise IndexError("Result field index out of range")
+
+        if field == len(self.columns):
+            return self.label
+
+        return self.columns[field][self.row]
+
+    def tolist(self):
+        """Return the result's fields as a new list, the affinity label last"""
+        return [column[self.row] for column in self.columns] + [self.label]
+
+
+class ResultSet:
+    """Ordered set of results held as columns, sharing the convert key's field data rather than copying it
+
+            Each result costs a row index and a slot number. Indexing returns a Result view, slicing a ResultSet
+            sharing the same columns.
+
+            Args:
+                columns (list): One sequence per result field, such as the columns of a ConvertKey
+                rows (array: int): Row of each result in the columns
+                slots (array: int): Convert key slot each result was found in
+                labels (list: str): Affinity label of every slot
+
+            Attributes:
+                columns (list): One sequence per result field
+                labels (list: str): Affinity label of every slot
+    """
+
+    __slots__ = ('columns', 'labels', '_rows', '_slots')
+
+    def __init__(self, columns=(), rows=None, slots=None, labels=()):
+        """Constructor"""
+        self.columns = columns
+        self.labels = labels
+        self._rows = rows if rows is not None else array('I')
+        self._slots = slots if slots is not None else array('H')
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return ResultSet(self.columns, self._rows[index], self._slots[index], self.labels)
+
+        return Result(self.columns, self._rows[index], self.labels[self._slots[index]])
+
+    def __iter__(self):
+        for row, slot in zip(self._rows, self._slots):
+            yield Result(self.columns, row, self.labels[slot])
+
+    def extend(self, other):
+        """Append the results of another set drawn from the same columns, adopting its columns if this set is empty"""
+        if not self._rows:
+            self.columns, self.labels = other.columns, other.labels
+        elif other.columns is not self.columns:
+            raise ValueError("Only results drawn from the same columns can be combined")
+
+        self._rows.extend(other._rows)
+        self._slots.extend(other._slots)
+
+    def tolist(self):
+        """Return every result as a new list of fields, the affinity label last"""
+        return [result.tolist() for result in self]
+
+
+def determine_results(ranking, convert_key, initials):
+    """Return the results for a ranking, looked up in the convert key
+
+            Args:
+                ranking (list: list): Ranked groups of category indices, as returned by list_max_index
+                convert_key (ConvertKey): Convert key translating ranked category triples to results, either
+                    compiled in memory or an SqliteConvertKey
+                initials (list: str): Short name of each category, used to label the affinity of a result
+
+            Returns:
+                ResultSet: Each convert key entry found, with the joined category initials as its last field
+    """
+    labels = rank_labels(initials)
+
+    combined_ranks = []
+    for ranks in ranking[:n_result_ranks]:
+        combined_ranks.extend(ranks)
+
+    slots = [(key[0] * n_categories + key[1]) * n_categories + key[2]
+             for key in itertools.permutations(combined_ranks, 3)]
+
+    # Fetch every slot of the ranking at once, then keep the permutation order
+    columns, found = convert_key.table(slots)
+    rows = array('I')
+    result_slots = array('H')
+    for slot in slots:
+        if slot in found:
+            rows.extend(found[slot])
+            result_slots.extend([slot] * len(found[slot]))
+
+    return ResultSet(columns, rows, result_slots, labels)
+
+
+def ranking_signature(ranking):
+    """Return the hashable signature of a ranking - its top tie groups, which alone determine the results"""
+    return tuple(tuple(ranks) for ranks in ranking[:n_result_ranks])
+
+
+class ResultCache:
+    """Bounded LRU cache of finished result sets, keyed by ranking signature
+
+            The cache belongs to one convert key and one set of initials. Looking up with a different convert key or
+            initials object (for instance after the convert key has been reloaded) clears it automatically.
+
+            Args:
+                maxsize (int): Maximum number of signatures held before the least recently used is evicted
+
+            Attributes:
+                maxsize (int): Maximum number of signatures held before the least recently used is evicted
+                hits (int): Number of lookups answered from the cache
+                misses (int): Number of lookups that had to be computed
+    """
+
+    def __init__(self, maxsize=1024):
+        """Constructor"""
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()
+        self._convert_key = None
+        self._initials = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, ranking, convert_key, initials):
+        """Return the result set for a ranking, computing and storing it on a miss. The set must not be mutated"""
+        signature = ranking_signature(ranking)
+
+        with self._lock:
+            if convert_key is not self._convert_key or initials is not self._initials:
+                self._reset(convert_key, initials)
+
+            if signature in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(signature)
+                return self._entries[signature]
+            self.misses += 1
+
+        results = determine_results(ranking, convert_key, initials)
+
+        with self._lock:
+            if convert_key is self._convert_key and initials is self._initials:
+                self._entries[signature] = results
+                if len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+
+        return results
+
+    def clear(self):
+        """Drop every cached result and reset the hit/miss counters"""
+        with self._lock:
+            self._reset(None, None)
+
+    def _reset(self, convert_key, initials):
+        self._entries.clear()
+        self._convert_key = convert_key
+        self._initials = initials
+        self.hits = 0
+        self.misses = 0
+
+
+# Process-wide cache used by the quiz
+result_cache = ResultCache()
+
+
+def unresolved_categories(scores, remaining, max_selection, min_selection=1):
+    """Return the categories whose place in the top tie groups could still change, or an empty list once settled
+
+            Each category's final score lies between its score plus its remaining questions answered at the minimum
+            selection and at the maximum. The top groups are peeled off one at a time, and each is settled only when its
+            members must end equal (nothing left to answer) and above every other category left.
+
+            Args:
+                scores (list: int): Current score of each category
+                remaining (list: int): Number of questions of each category still to be answered
+                max_selection (int): Largest value a single answer adds to a score
+                min_selection (int): Smallest value a single answer adds to a score
+
+            Returns:
+                list: int: Categories involved in an unsettled comparison, best candidates for the next questions
+    """
+    low = [score + left * min_selection for score, left in zip(scores, remaining)]
+    high = [score + left * max_selection for score, left in zip(scores, remaining)]
+
+    def above(i, j):
+        return low[i] > high[j]
+
+    def equal(i, j):
+        return low[i] == high[i] == low[j] == high[j]
+
+    candidates = set(range(len(scores)))
+    for _ in range(n_result_ranks):
+        if not candidates:
+            break
+
+        # Categories that may yet finish on top of those left
+        top = {i for i in candidates if not any(above(j, i) for j in candidates)}
+        rest = candidates - top
+
+        unsettled = {i for i in top if not all(equal(i, j) for j in top)}
+        unsettled |= {j for j in rest if not all(above(i, j) for i in top)}
+        if unsettled:
+            return sorted(unsettled | top)
+
+        candidates = rest
+
+    return []
+
+
+def score_answers(sheet, convert_key, initials):
+    """Score a single answer sheet, returning its (scoring, ranking, results)"""
+    scoring = score_sheet(sheet)
+    ranking = list_max_index(scoring, n_ranks)
+
+    return scoring, ranking, determine_results(ranking, convert_key, initials)
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""This module is the batch scoring API - tallying and ranking many answer sheets at once with NumPy
+
+It is kept apart from the scoring engine so the quiz, which scores one subject at a time, never imports NumPy.
+"""
+
+import numpy as np
+
+import scoring
+
+
+def rank_groups(scores, n=scoring.n_ranks):
+    """Return the tie group of every score, ranking along the last axis of a 1-D or 2-D array of scores
+
+            Group 0 holds the maximum score, group 1 the next distinct score, and so on. Scores outside the top n
+            groups are assigned group n. Works on many subjects' scores at once without a Python-level loop.
+    """
+    # Sort ascending and reverse rather than negating, which wraps around for unsigned scores
+    scores = np.asarray(scores)
+    order = np.flip(np.argsort(scores, axis=-1, kind='stable'), axis=-1)
+    ordered = np.take_along_axis(scores, order, axis=-1)
+
+    # A new group starts wherever the descending scores change value
+    steps = np.zeros(ordered.shape, dtype=np.intp)
+    steps[..., 1:] = ordered[..., 1:] != ordered[..., :-1]
+    ordered_groups = np.minimum(np.cumsum(steps, axis=-1), n)
+
+    groups = np.empty_like(ordered_groups)
+    np.put_along_axis(groups, order, ordered_groups, axis=-1)
+
+    return groups
+
+
+def groups_to_ranking(groups, n=scoring.n_ranks):
+    """Convert one row of rank_groups output into list_max_index style tie groups"""
+    ranking = [[] for _ in range(n)]
+
+    # As with list_max_index, a row with no scores at all gives n empty groups
+    if len(groups) == 0:
+        return ranking
+
+    for i, group in enumerate(groups):
+        if group < n:
+            ranking[group].append(i)
+
+    # Groups are numbered contiguously from 0, so any empty groups are trailing
+    return [ranks for ranks in ranking if ranks]
+
+
+def score_batch(types, selections):
+    """Tally many answer sheets at once
+
+            Args:
+                types (array-like: int): Question type of each answer. Either 1-D, when every sheet answers the same
+                    questions in the same order, or 2-D of the same shape as selections
+                selections (array-like: int): 2-D array of selections, one row per sheet and one column per question
+
+            Returns:
+                numpy.ndarray: Array of shape (sheets, n_categories) holding the category scores of every sheet
+    """
+    types = np.asarray(types, dtype=np.intp)
+    selections = np.asarray(selections, dtype=np.int64)
+    if selections.ndim != 2:
+        raise ValueError("selections must be a 2-D array of shape (sheets, questions)")
+
+    # Shared question order - a single matrix product against the one-hot question types
+    if types.ndim == 1:
+        one_hot = np.zeros((types.shape[0], scoring.n_categories), dtype=np.int64)
+        one_hot[np.arange(types.shape[0]), types] = 1
+        return selections @ one_hot
+
+    # Per-sheet question order - offset each type into its own row and count in one pass
+    if types.shape != selections.shape:
+        raise ValueError("types must be 1-D or match the shape of selections")
+    flat = (types + np.arange(types.shape[0])[:, None] * scoring.n_categories).ravel()
+    counts = np.bincount(flat, weights=selections.ravel(), minlength=types.shape[0] * scoring.n_categories)
+
+    return counts.astype(np.int64).reshape(types.shape[0], scoring.n_categories)
+
+
+def rank_batch(scores, n=scoring.n_ranks):
+    """Rank each row of a 2-D score array, returning one list_max_index style ranking per row"""
+    return [groups_to_ranking(row, n) for row in rank_groups(scores, n).tolist()]
+
+
+def results_batch(rankings, convert_key, initials):
+    """Look up results for many rankings, computing each distinct ranking only once
+
+            Rankings are grouped by their top groups so that a population of sheets sharing a profile costs one lookup.
+            The returned result sets are shared between sheets with the same profile and must not be mutated.
+    """
+    found = {}
+    results = []
+    for ranking in rankings:
+        signature = scoring.ranking_signature(ranking)
+        if signature not in found:
+            found[signature] = scoring.determine_results(ranking, convert_key, initials)
+        results.append(found[signature])
+
+    return results
+
+
+def score_answers_batch(types, selections, convert_key, initials):
+    """Score many answer sheets at once, returning (scores, rankings, results) with one entry per sheet"""
+    scores = score_batch(types, selections)
+    groups = rank_groups(scores)
+    rankings = [groups_to_ranking(row) for row in groups.tolist()]
+
+    # Results only depend on the top groups, so look up each distinct profile once, through the shared cache
+    profiles, inverse = np.unique(np.minimum(groups, scoring.n_result_ranks), axis=0, return_inverse=True)
+    found = [scoring.result_cache.get(groups_to_ranking(profile, scoring.n_result_ranks), convert_key, initials)
+             for profile in profiles.tolist()]
+
+    return scores, rankings, [found[i] for i in inverse.ravel().tolist()]
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+"""This module is the synthetic-subject harness - it drives simulated subjects through the real quiz, key by key
+
+Each subject goes from the cover through the instructions, every page of the quiz and the summary, and back to the
+cover, by key events delivered to the panes' EVT_CHAR_HOOK handlers just as a keyboard user's would be: ENTER past
+the cover and instructions, TAB into a page, a number key 1-4 per question, ENTER to submit each page, and ENTER to
+leave the summary once every result is shown. Run it under a virtual display, e.g.
+
+    xvfb-run -a python subject_harness.py --subjects 5000 -o harness.json
+
+It records the latency of every keystroke until the window has repainted, the time of every question set
+transition, the process's memory after each subject, and the count of live widgets by class after each subject, so
+slowdowns and leaks that only appear after a kiosk has run all day show up in minutes.
+"""
+
+import argparse
+import collections
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+import wx
+
+import config
+import cst_frame
+import gbl_env
+
+# Keys a keyboard user presses, and the longest wait for the results of a subject to be shown
+key_names = {wx.WXK_RETURN: 'ENTER', wx.WXK_TAB: 'TAB', ord('1'): '1', ord('2'): '2', ord('3'): '3', ord('4'): '4'}
+results_timeout = 60
+
+# One frame at 60 Hz, the budget for a keystroke that only moves the selection
+frame_ms = 1000 / 60
+selection_keys = ('TAB', '1', '2', '3', '4')
+
+
+def memory_usage():
+    """Return the resident memory of this process in bytes, or None where it cannot be read"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+
+    try:
+        with open('/proc/self/statm', 'r') as stream:
+            return int(stream.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+
+def count_widgets():
+    """Return the number of live windows of each class, across every top-level window"""
+    counts = collections.Counter()
+    pending = list(wx.GetTopLevelWindows())
+    while pending:
+        window = pending.pop()
+        counts[type(window).__name__] += 1
+        pending.extend(window.GetChildren())
+
+    return counts
+
+
+def percentiles(values):
+    """Return the count, median, 95th/99th percentile, maximum and number over one frame of a list of milliseconds"""
+    if not values:
+        return {'count': 0}
+
+    ordered = sorted(values)
+
+    def at(fraction):
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    return {'count': len(ordered), 'median_ms': statistics.median(ordered), 'p95_ms': at(0.95), 'p99_ms': at(0.99),
+            'max_ms': ordered[-1], 'over_one_frame': sum(value > frame_ms for value in ordered)}
+
+
+class SubjectHarness:
+    """Drives simulated subjects through a quiz window and collects timings
+
+            Args:
+                window (MainApp): Quiz window to drive, with its content loaded
+                rng (random.Random): Source of the simulated subjects' selections
+
+            Attributes:
+                window (MainApp): Quiz window being driven
+                rng (random.Random): Source of the simulated subjects' selections
+                key_latency (dict: list): Milliseconds from each keystroke until the window repainted, keyed by key
+                transitions (list: float): Milliseconds each ENTER took to move the quiz on to its next question set
+                memory (list: int): Resident memory in bytes after each subject
+                widgets (list: int): Number of live widgets after each subject
+                first_widgets (collections.Counter): Live widgets by class before the first subject
+                last_widgets (collections.Counter): Live widgets by class after the latest subject
+    """
+
+    def __init__(self, window, rng):
+        """Constructor"""
+        self.window = window
+        self.rng = rng
+        self.app = wx.GetApp()
+
+        self.key_latency = collections.defaultdict(list)
+        self.transitions = []
+        self.memory = []
+        self.widgets = []
+        self.first_widgets = None
+        self.last_widgets = None
+
+    def active_pane(self):
+        """Return the pane currently shown"""
+        for pane in [self.window.pane_cover] + list(self.window._panes.values()):
+            if pane.IsShown():
+                return pane
+
+        raise RuntimeError("No pane is shown")
+
+    def settle(self):
+        """Process pending events and repaint the window"""
+        self.app.Yield(True)
+        self.window.Update()
+
+    def press(self, key_code):
+        """Deliver a key press to the shown pane's char hook, returning the milliseconds until the window repainted"""
+        pane = self.active_pane()
+        event = wx.KeyEvent(wx.wxEVT_CHAR_HOOK)
+        event.SetKeyCode(key_code)
+        event.SetEventObject(pane)
+
+        start = time.perf_counter()
+        pane.GetEventHandler().ProcessEvent(event)
+        self.settle()
+        elapsed = (time.perf_counter() - start) * 1000
+
+        self.key_latency[key_names[key_code]].append(elapsed)
+
+        return elapsed
+
+    def wait_for(self, condition, timeout):
+        """Keep the event loop running until a condition holds, raising RuntimeError after timeout seconds"""
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() > deadline:
+                raise RuntimeError("Timed out waiting for the quiz")
+            self.settle()
+            time.sleep(0.001)
+
+    def run_subject(self):
+        """Take one simulated subject from the cover, through every page of the quiz, to the summary and back"""
+        window = self.window
+        maximum = min(len(config.settings.rbox_labels), 4)
+
+        self.press(wx.WXK_RETURN)
+        self.press(wx.WXK_RETURN)
+
+        # TAB enters keyboard mode on the first page, later pages start with their first question selected
+        quiz = window.pane_quiz
+        while quiz.IsShown():
+            if quiz.selected_question == -1:
+                self.press(wx.WXK_TAB)
+            for _ in range(len(quiz.current_questions)):
+                self.press(ord(str(self.rng.randint(1, maximum))))
+            self.transitions.append(self.press(wx.WXK_RETURN))
+
+        # Leave the summary once the results have all been filled in, which happens on a worker thread
+        summary = window.pane_summary
+        self.wait_for(lambda: not summary.gauge.IsShown(), results_timeout)
+        self.press(wx.WXK_RETURN)
+
+        if not window.pane_cover.IsShown():
+            raise RuntimeError("The summary did not return to the cover")
+
+    def run(self, subjects, report_every=0):
+        """Run a number of subjects, printing progress every report_every subjects if set"""
+        self.wait_for(lambda: self.window.content_loaded.is_set() and len(self.window._panes) == 3, results_timeout)
+        if self.window.content_error:
+            raise self.window.content_error
+        self.first_widgets = count_widgets()
+
+        start = time.perf_counter()
+        for subject in range(1, subjects + 1):
+            self.run_subject()
+
+            self.memory.append(memory_usage())
+            self.last_widgets = count_widgets()
+            self.widgets.append(sum(self.last_widgets.values()))
+
+            if report_every and subject % report_every == 0:
+                print("{} subjects, {:.1f} s, {} widgets, {:.1f} MB".format(
+                    subject, time.perf_counter() - start, self.widgets[-1], (self.memory[-1] or 0) / 1e6),
+                    file=sys.stderr)
+
+        return time.perf_counter() - start
+
+    def report(self, elapsed):
+        """Return the collected timings, memory growth and widget counts as a JSON-ready dictionary"""
+        memory = [m for m in self.memory if m is not None]
+        leaked = {name: count - self.first_widgets.get(name, 0)
+                  for name, count in self.last_widgets.items() if count != self.first_widgets.get(name, 0)}
+
+        return {'subjects': len(self.widgets),
+                'elapsed_s': elapsed,
+                'keystrokes': {key: percentiles(values) for key, values in sorted(self.key_latency.items())},
+                'question_set_transitions': percentiles(self.transitions),
+                'memory': {'first_bytes': memory[0] if memory else None,
+                           'last_bytes': memory[-1] if memory else None,
+                           'growth_per_subject_bytes': (memory[-1] - memory[0]) / (len(memory) - 1)
+                           if len(memory) > 1 else None},
+                'widgets': {'before': sum(self.first_widgets.values()),
+                            'after': self.widgets[-1] if self.widgets else None,
+                            'leaked_by_class': leaked},
+                'transition_drift': drift(self.transitions)}
+
+
+def drift(values):
+    """Return the median of the last tenth of a series over the median of its first tenth, or None if too short"""
+    tenth = len(values) // 10
+    if tenth == 0:
+        return None
+
+    first = statistics.median(values[:tenth])
+
+    return statistics.median(values[-tenth:]) / first if first else None
+
+
+def main(argv=None):
+    """Parse the command line, drive the simulated subjects and write the report"""
+    parser = argparse.ArgumentParser(description="Drive simulated subjects through the quiz and report latency")
+    parser.add_argument('--subjects', type=int, default=1000, help="Number of simulated subjects")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the simulated subjects' selections")
+    parser.add_argument('--adaptive', action='store_true', help="End each quiz once its results are settled")
+    parser.add_argument('--report-every', type=int, default=100, help="Print progress every this many subjects")
+    parser.add_argument('-o', '--output', help="File to write the JSON report to, standard output if omitted")
+    parser.add_argument('--check-frame', action='store_true',
+                        help="Exit with status 1 if the 95th percentile of any selection key takes over one frame")
+    args = parser.parse_args(argv)
+
+    cst_frame.MainApp.adaptive = args.adaptive
+
+    app = wx.App()
+    window = cst_frame.open_window()
+
+    harness = SubjectHarness(window, random.Random(args.seed))
+    elapsed = harness.run(args.subjects, args.report_every)
+    report = dict(harness.report(elapsed), demo=gbl_env.is_demo)
+
+    window.Destroy()
+    app.Yield()
+
+    if args.output:
+        with open(args.output, 'w') as stream:
+            json.dump(report, stream, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.check_frame:
+        slow = [key for key in selection_keys
+                if report['keystrokes'].get(key, {}).get('p95_ms', 0) > frame_ms]
+        if slow:
+            print("Over one frame ({:.1f} ms) at the 95th percentile: {}".format(frame_ms, ", ".join(slow)),
+                  file=sys.stderr)
+            return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
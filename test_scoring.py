@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""This module checks the scoring engine - rankings against the original list_max_index, result sets and settling"""
+
+import itertools
+import random
+
+import numpy as np
+import pytest
+
+import convert_key
+import scoring
+import scoring_batch
+
+
+def original_list_max_index(ls, n):
+    """The list_max_index the single-pass version replaced, kept as the reference ranking"""
+    ls_return = []
+
+    reverse_ordered_list = list(reversed(sorted(set(ls))))
+
+    try:
+        for k in range(n):
+            ls_return.append([i for i, j in enumerate(ls) if j == reverse_ordered_list[k]])
+    except IndexError:
+        pass
+
+    return ls_return
+
+
+def random_scores(rng, length, top):
+    """Return a list of random scores, drawn from a small range so that ties are common"""
+    return [rng.randint(0, top) for _ in range(length)]
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_list_max_index_matches_original(seed):
+    rng = random.Random(seed)
+    for _ in range(500):
+        scores = random_scores(rng, rng.randint(0, 12), rng.choice((1, 3, 12, 100)))
+        n = rng.randint(0, 9)
+        assert scoring.list_max_index(scores, n) == original_list_max_index(scores, n)
+
+
+@pytest.mark.parametrize('n', range(0, 6))
+def test_list_max_index_empty(n):
+    assert scoring.list_max_index([], n) == original_list_max_index([], n)
+
+
+@pytest.mark.parametrize('seed', range(10))
+@pytest.mark.parametrize('n', (0, 1, scoring.n_result_ranks, scoring.n_ranks, scoring.n_categories + 1))
+def test_rank_batch_matches_original(seed, n):
+    rng = random.Random(seed)
+    for width in (0, 1, scoring.n_categories):
+        rows = [random_scores(rng, width, rng.choice((1, 3, 12))) for _ in range(100)]
+        scores = np.array(rows, dtype=np.int64).reshape(len(rows), width)
+
+        rankings = scoring_batch.rank_batch(scores, n)
+        assert rankings == [original_list_max_index(row, n) for row in rows]
+
+        groups = scoring_batch.rank_groups(scores, n).tolist()
+        assert [scoring_batch.groups_to_ranking(row, n) for row in groups] == rankings
+
+
+@pytest.mark.parametrize('dtype', (np.uint8, np.uint16, np.uint64, np.int8, np.int64, np.float64))
+def test_rank_groups_dtypes(dtype):
+    rng = random.Random(0)
+    rows = [random_scores(rng, scoring.n_categories, 5) for _ in range(200)] + [[0, 5, 3, 0, 0, 0, 0]]
+
+    rankings = scoring_batch.rank_batch(np.array(rows, dtype=dtype))
+    assert rankings == [original_list_max_index(row, scoring.n_ranks) for row in rows]
+    assert rankings[-1] == [[1], [2], [0, 3, 4, 5, 6]]
+
+
+def test_rank_groups_one_subject():
+    scores = [3, 9, 3, 1, 9, 0, 2]
+    groups = scoring_batch.rank_groups(np.array(scores)).tolist()
+    assert scoring_batch.groups_to_ranking(groups) == original_list_max_index(scores, scoring.n_ranks)
+
+
+def test_ranking_without_results():
+    key = convert_key.ConvertKey({0o012: [['Result', 'Field', 'Link', 'Text']]})
+    initials = tuple('ABCDEFG')
+
+    ranking = scoring.list_max_index([1, 2, 3, 4, 5, 6, 7], scoring.n_ranks)
+    results = scoring.determine_results(ranking, key, initials)
+    assert len(results) == 0
+
+    # The summary extends the frame's results with every chunk handed over, the empty set included
+    shown = scoring.ResultSet()
+    shown.extend(results)
+    assert len(shown) == 0 and shown.tolist() == []
+
+    shown.extend(scoring.determine_results(scoring.list_max_index([7, 6, 5, 0, 0, 0, 0], scoring.n_ranks), key,
+                                           initials))
+    assert shown.tolist() == [['Result', 'Field', 'Link', 'Text', 'A|B|C']]
+
+
+def completions(scores, remaining, max_selection, min_selection=1):
+    """Yield every set of final scores the remaining questions could produce"""
+    ranges = [range(score + left * min_selection, score + left * max_selection + 1)
+              for score, left in zip(scores, remaining)]
+
+    return itertools.product(*ranges)
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_settled_results_cannot_change(seed):
+    rng = random.Random(seed)
+    settled = 0
+    for _ in range(300):
+        max_selection = rng.randint(2, 4)
+        scores = [rng.randint(0, 12) for _ in range(scoring.n_categories)]
+        remaining = [0] * scoring.n_categories
+        for _ in range(rng.randint(0, 4)):
+            remaining[rng.randrange(scoring.n_categories)] += 1
+
+        if scoring.unresolved_categories(scores, remaining, max_selection):
+            continue
+        settled += 1
+
+        # Once settled, no way of answering what is left may change the results
+        signature = scoring.ranking_signature(scoring.list_max_index(scores, scoring.n_ranks))
+        for final in completions(scores, remaining, max_selection):
+            assert scoring.ranking_signature(scoring.list_max_index(list(final), scoring.n_ranks)) == signature
+
+    assert settled
+
+
+def test_result_indexes_like_a_list():
+    key = convert_key.ConvertKey({0o012: [['Result', 'Field', 'Link', 'Text']]})
+    results = scoring.determine_results(scoring.list_max_index([7, 6, 5, 0, 0, 0, 0], scoring.n_ranks), key,
+                                        tuple('ABCDEFG'))
+    result, fields = results[0], results[0].tolist()
+
+    assert len(result) == len(fields) == 5
+    for i in range(-len(fields), len(fields)):
+        assert result[i] == fields[i]
+    assert result[1:-1] == fields[1:-1]
+    for i in (len(fields), -len(fields) - 1):
+        with pytest.raises(IndexError):
+            result[i]